@@ -0,0 +1,66 @@
+﻿import math
+
+
+def ease_out(t):
+    return 1 - (1 - t) ** 3
+
+
+def ease_in_out(t):
+    return 0.5 - math.cos(math.pi * t) / 2
+
+
+class Tween:
+    def __init__(self, name, start, duration, rows=(), region=None, easing=ease_out, data=None):
+        self.name = name
+        self.start = start
+        self.duration = duration
+        self.end = start + duration
+        self.rows = tuple(rows)
+        self.region = region
+        self.easing = easing
+        self.data = data
+
+    def progress(self, now):
+        if now >= self.end or self.duration <= 0:
+            return 1.0
+        return self.easing(max(0.0, (now - self.start) / self.duration))
+
+    def fade(self, now, steps):
+        return round((1.0 - self.progress(now)) * steps)
+
+
+class Animator:
+    def __init__(self):
+        self.tweens = {}
+        self.finished = []
+
+    @property
+    def active(self):
+        return bool(self.tweens)
+
+    def start(self, name, now, duration, rows=(), region=None, easing=ease_out, data=None):
+        self.cancel(name)
+        tween = self.tweens[name] = Tween(name, now, duration, rows, region, easing, data)
+        return tween
+
+    def get(self, name):
+        return self.tweens.get(name)
+
+    def cancel(self, name):
+        tween = self.tweens.pop(name, None)
+        if tween is not None:
+            self.finished.append(tween)
+
+    def clear(self):
+        self.finished.extend(self.tweens.values())
+        self.tweens.clear()
+
+    def update(self, now):
+        for name, tween in list(self.tweens.items()):
+            if now >= tween.end:
+                del self.tweens[name]
+                self.finished.append(tween)
+        finished = self.finished
+        self.finished = []
+        return finished
+
@@ -0,0 +1,166 @@
+﻿from engine import HARD_DROP, KICKS, LEFT, RIGHT, ROTATE, ROTATIONS, Piece
+
+DEFAULT_WEIGHTS = {
+    "height": -0.510066,
+    "lines": 0.760666,
+    "holes": -0.35663,
+    "bumpiness": -0.184483,
+}
+
+
+def popcount(value):
+    return bin(value).count("1")
+
+
+def collides(rows, cols, kind, rotation, x, y):
+    state = ROTATIONS[kind][rotation]
+    left = x + state.left
+    if left < 0 or x + state.right >= cols or y + state.bottom >= len(rows):
+        return True
+    for r, mask in state.masks:
+        ny = y + r
+        if ny >= 0 and rows[ny] & (mask << left):
+            return True
+    return False
+
+
+def drop_y(rows, cols, kind, rotation, x, y):
+    while not collides(rows, cols, kind, rotation, x, y + 1):
+        y += 1
+    return y
+
+
+def rotate(rows, cols, kind, rotation, x, y):
+    target = (rotation + 1) % 4
+    for dx, dy in KICKS[kind][rotation, target]:
+        if not collides(rows, cols, kind, target, x + dx, y + dy):
+            return target, x + dx, y + dy
+    return None
+
+
+def place(rows, cols, kind, rotation, x, y):
+    state = ROTATIONS[kind][rotation]
+    if y + state.top < 0:
+        return None, 0
+    full = (1 << cols) - 1
+    board = rows[:]
+    left = x + state.left
+    for r, mask in state.masks:
+        board[y + r] |= mask << left
+    cleared = [y + r for r, _mask in state.masks if board[y + r] == full]
+    for row in cleared:
+        del board[row]
+        board.insert(0, 0)
+    return board, len(cleared)
+
+
+def features(rows, cols):
+    heights = [0] * cols
+    height = len(rows)
+    seen = 0
+    holes = 0
+    for y, row in enumerate(rows):
+        holes += popcount(seen & ~row)
+        new = row & ~seen
+        while new:
+            low = new & -new
+            heights[low.bit_length() - 1] = height - y
+            new ^= low
+        seen |= row
+    bumpiness = sum(abs(heights[i] - heights[i + 1]) for i in range(cols - 1))
+    return sum(heights), holes, bumpiness
+
+
+def placements(rows, cols, kind, rotation, x, y):
+    results = []
+    seen = set()
+    actions = []
+    for turns in range(4):
+        if turns:
+            turned = rotate(rows, cols, kind, rotation, x, y)
+            if turned is None:
+                break
+            rotation, x, y = turned
+            actions.append(ROTATE)
+        for step, action in ((-1, LEFT), (1, RIGHT)):
+            nx = x
+            shifts = []
+            while True:
+                key = (rotation, nx)
+                if key not in seen:
+                    seen.add(key)
+                    landing = drop_y(rows, cols, kind, rotation, nx, y)
+                    results.append((rotation, nx, landing, actions + shifts + [HARD_DROP]))
+                if collides(rows, cols, kind, rotation, nx + step, y):
+                    break
+                nx += step
+                shifts.append(action)
+    return results
+
+
+class Autoplayer:
+    def __init__(self, weights=None, lookahead=True, beam=4):
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.lookahead = lookahead
+        self.beam = beam
+
+    def evaluate(self, rows, cols, lines):
+        height, holes, bumpiness = features(rows, cols)
+        weights = self.weights
+        return (
+            weights["height"] * height
+            + weights["lines"] * lines
+            + weights["holes"] * holes
+            + weights["bumpiness"] * bumpiness
+        )
+
+    def best_score(self, rows, cols, kind, lines):
+        spawn = Piece(kind).spawn(kind, cols)
+        if collides(rows, cols, kind, 0, spawn.x, spawn.y):
+            return None
+        best = None
+        for rotation, x, y, _actions in placements(rows, cols, kind, 0, spawn.x, spawn.y):
+            board, cleared = place(rows, cols, kind, rotation, x, y)
+            if board is None:
+                continue
+            score = self.evaluate(board, cols, lines + cleared)
+            if best is None or score > best:
+                best = score
+        return best
+
+    def plan(self, state):
+        if state.game_over:
+            return []
+        rows = state.rows
+        cols = len(state.grid[0])
+        piece = state.current
+        candidates = []
+        for rotation, x, y, actions in placements(rows, cols, piece.kind, piece.rotation, piece.x, piece.y):
+            board, cleared = place(rows, cols, piece.kind, rotation, x, y)
+            if board is None:
+                continue
+            candidates.append((self.evaluate(board, cols, cleared), board, cleared, actions))
+        if not candidates:
+            return [HARD_DROP]
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+
+        if not self.lookahead:
+            return candidates[0][3]
+
+        best_actions = candidates[0][3]
+        best_score = None
+        next_kind = state.next_piece.kind
+        for _score, board, cleared, actions in candidates[: self.beam]:
+            score = self.best_score(board, cols, next_kind, cleared)
+            if score is not None and (best_score is None or score > best_score):
+                best_score = score
+                best_actions = actions
+        return best_actions
+
+
+def play(state, player=None, max_pieces=None):
+    player = player or Autoplayer()
+    while not state.game_over and (max_pieces is None or state.pieces < max_pieces):
+        for action in player.plan(state):
+            state.apply_input(action)
+    return state
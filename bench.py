@@ -0,0 +1,348 @@
+﻿import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+from engine import COLORS, COLS, ROTATIONS, ROWS, SHAPES, GameState
+
+BOARDS = {
+    "empty": 0,
+    "half": ROWS // 2,
+    "topout": ROWS - 4,
+}
+
+
+def fill_board(state, height, seed):
+    rng = random.Random(seed)
+    for y in range(ROWS - height, ROWS):
+        holes = {rng.randrange(COLS) for _ in range(rng.randint(1, 3))}
+        for x in range(COLS):
+            if x not in holes:
+                state.grid[y][x] = COLORS[rng.randrange(len(COLORS))]
+                state.rows[y] |= 1 << x
+    state.rebuild_index()
+    return state
+
+
+def make_state(board, seed=1):
+    state = GameState(seed=seed)
+    return fill_board(state, BOARDS[board], seed)
+
+
+def save_board(state):
+    return list(state.rows), [row[:] for row in state.grid], list(state.tops)
+
+
+def restore_board(state, saved):
+    rows, grid, tops = saved
+    state.rows[:] = rows
+    state.grid = [row[:] for row in grid]
+    state.tops[:] = tops
+    state.board_version += 1
+    state.game_over = False
+
+
+def measure(func, inner, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(inner)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best / inner
+
+
+def result(per_op, inner, baseline=0.0):
+    per_op = max(per_op - baseline, 1e-9)
+    return {
+        "us_per_op": round(per_op * 1e6, 4),
+        "ops_per_sec": round(1 / per_op, 1),
+        "iterations": inner,
+    }
+
+
+def bench_collides(board, repeat):
+    state = make_state(board)
+    probes = [
+        (kind, rotation, x, y)
+        for kind in range(len(SHAPES))
+        for rotation in range(4)
+        for x in range(-2, COLS)
+        for y in range(-2, ROWS, 3)
+    ]
+
+    def run(n):
+        collides = state.collides
+        for i in range(n):
+            collides(*probes[i % len(probes)])
+
+    return result(measure(run, 20000, repeat), 20000)
+
+
+def bench_ghost_y(board, repeat):
+    state = make_state(board)
+    pieces = []
+    for kind in range(len(SHAPES)):
+        for rotation in range(4):
+            for x in range(-2, COLS):
+                piece = state.new_piece().spawn(kind)
+                piece.rotation = rotation
+                piece.x = x
+                if not state.collides(kind, rotation, x, piece.y):
+                    pieces.append(piece)
+
+    def run(n):
+        for i in range(n):
+            state.current = pieces[i % len(pieces)]
+            state.ghost_y()
+
+    return result(measure(run, 5000, repeat), 5000)
+
+
+def bench_rotate_piece(board, repeat):
+    state = make_state(board)
+    starts = [(kind, x) for kind in range(len(SHAPES)) for x in range(COLS)]
+
+    def run(n):
+        piece = state.current
+        for i in range(n):
+            if i % 8 == 0:
+                kind, x = starts[(i // 8) % len(starts)]
+                piece.spawn(kind)
+                piece.x = x
+                piece.y = 0
+            state.rotate_piece()
+
+    return result(measure(run, 8000, repeat), 8000)
+
+
+def bench_lock_piece(board, repeat):
+    state = make_state(board)
+    saved = save_board(state)
+    drops = []
+    for kind in range(len(SHAPES)):
+        for rotation in range(4):
+            for x in range(-2, COLS):
+                piece = state.new_piece().spawn(kind)
+                piece.rotation = rotation
+                piece.x = x
+                if state.collides(kind, rotation, x, 0):
+                    continue
+                state.current = piece
+                y = state.ghost_y()
+                if y + ROTATIONS[kind][rotation].top >= 0:
+                    drops.append((kind, rotation, x, y))
+    current = state.new_piece()
+
+    def baseline(n):
+        for i in range(n):
+            restore_board(state, saved)
+            kind, rotation, x, y = drops[i % len(drops)]
+            current.kind, current.rotation, current.x, current.y = kind, rotation, x, y
+            state.current = current
+
+    def run(n):
+        for i in range(n):
+            restore_board(state, saved)
+            kind, rotation, x, y = drops[i % len(drops)]
+            current.kind, current.rotation, current.x, current.y = kind, rotation, x, y
+            state.current = current
+            state.lock_piece()
+
+    inner = 3000
+    return result(measure(run, inner, repeat), inner, measure(baseline, inner, repeat))
+
+
+def bench_clear_lines(board, repeat):
+    state = make_state(board)
+    height = max(BOARDS[board], 4)
+    for y in range(ROWS - 4, ROWS, 2):
+        state.rows[y] = (1 << COLS) - 1
+        state.grid[y] = [COLORS[0]] * COLS
+    state.rebuild_index()
+    saved = save_board(state)
+    candidates = range(ROWS - height, ROWS)
+
+    def baseline(n):
+        for _ in range(n):
+            restore_board(state, saved)
+
+    def run(n):
+        for _ in range(n):
+            restore_board(state, saved)
+            state.clear_lines(candidates)
+
+    inner = 3000
+    return result(measure(run, inner, repeat), inner, measure(baseline, inner, repeat))
+
+
+def bench_games(repeat):
+    acts = ("left", "right", "rotate")
+
+    def run(n):
+        rng = random.Random(7)
+        for seed in range(n):
+            state = GameState(seed=seed)
+            while not state.game_over:
+                for _ in range(rng.randint(0, 4)):
+                    state.apply_input(rng.choice(acts))
+                state.apply_input("hard_drop")
+
+    return result(measure(run, 50, repeat), 50)
+
+
+def bench_background(repeat):
+    import tetris
+
+    if not tetris.Image:
+        return {}
+    results = {}
+    results["generate_background"] = result(
+        measure(lambda n: [tetris.generate_background(tetris.CANVAS_W, tetris.CANVAS_H) for _ in range(n)], 3, repeat),
+        3,
+    )
+    previous = os.environ.get("TETRIS_CACHE_DIR")
+    with tempfile.TemporaryDirectory() as cache:
+        os.environ["TETRIS_CACHE_DIR"] = cache
+        tetris.load_background(tetris.CANVAS_W, tetris.CANVAS_H)
+        results["load_background_cached"] = result(
+            measure(lambda n: [tetris.load_background(tetris.CANVAS_W, tetris.CANVAS_H) for _ in range(n)], 3, repeat),
+            3,
+        )
+    if previous is None:
+        os.environ.pop("TETRIS_CACHE_DIR", None)
+    else:
+        os.environ["TETRIS_CACHE_DIR"] = previous
+    return results
+
+
+def bench_tk(repeat):
+    import tkinter as tk
+
+    import tetris
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as exc:
+        print(f"Skipping Tk benchmarks: {exc}")
+        return {}
+
+    results = {}
+    game = tetris.Tetris(root, seed=1)
+    game.cancel_tick()
+    root.update()
+
+    start = time.perf_counter()
+    game.prepare_background()
+    results["prepare_background"] = result(time.perf_counter() - start, 1)
+
+    bench_draw(game, root, repeat, results, "")
+    game.canvas.destroy()
+    if tetris.ImageTk:
+        game = tetris.Tetris(root, seed=1, renderer="framebuffer")
+        game.cancel_tick()
+        root.update()
+        bench_draw(game, root, repeat, results, "framebuffer:")
+
+    root.destroy()
+    return results
+
+
+def bench_draw(game, root, repeat, results, prefix):
+    state = game.state
+
+    def draw():
+        game.full_frame = True
+        game.draw()
+
+    for board in BOARDS:
+        fill_board(state, BOARDS[board], 1)
+        draw()
+        root.update()
+        results[f"{prefix}draw_idle[{board}]"] = result(
+            measure(lambda n: [draw() for _ in range(n)], 200, repeat), 200
+        )
+
+        def moving(n):
+            for i in range(n):
+                state.current.x = 3 + i % 4
+                draw()
+                root.update_idletasks()
+
+        results[f"{prefix}draw_move[{board}]"] = result(measure(moving, 100, repeat), 100)
+
+        full = save_board(state)
+        empty = ([0] * ROWS, [[None] * COLS for _ in range(ROWS)], [ROWS] * COLS)
+
+        def changing(n):
+            for i in range(n):
+                restore_board(state, full if i % 2 else empty)
+                draw()
+                root.update_idletasks()
+
+        results[f"{prefix}draw_board_change[{board}]"] = result(measure(changing, 50, repeat), 50)
+        state.reset(seed=1)
+
+
+def run_benchmarks(repeat, include_tk):
+    results = {}
+    for board in BOARDS:
+        results[f"collides[{board}]"] = bench_collides(board, repeat)
+        results[f"ghost_y[{board}]"] = bench_ghost_y(board, repeat)
+        results[f"rotate_piece[{board}]"] = bench_rotate_piece(board, repeat)
+        results[f"lock_piece[{board}]"] = bench_lock_piece(board, repeat)
+        results[f"clear_lines[{board}]"] = bench_clear_lines(board, repeat)
+    results["random_games"] = bench_games(repeat)
+    results.update(bench_background(repeat))
+    if include_tk:
+        results.update(bench_tk(repeat))
+    return results
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    print(f"{'benchmark':36} {'before us':>12} {'after us':>12} {'speedup':>8}")
+    for name, entry in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        speedup = old["us_per_op"] / entry["us_per_op"] if entry["us_per_op"] else 0.0
+        print(f"{name:36} {old['us_per_op']:12.3f} {entry['us_per_op']:12.3f} {speedup:7.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Tetris engine and renderer hot paths.")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="where to write the JSON results")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="repetitions per benchmark, best is kept")
+    parser.add_argument("--no-tk", action="store_true", help="skip the benchmarks that need a display")
+    parser.add_argument("--compare", help="previous results file to compare against")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.repeat, not args.no_tk)
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for name, entry in results.items():
+        print(f"{name:36} {entry['us_per_op']:12.3f} us {entry['ops_per_sec']:14.1f} ops/s")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
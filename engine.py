@@ -0,0 +1,655 @@
+﻿import random
+from collections import deque, namedtuple
+
+COLS = 10
+ROWS = 20
+
+SHAPES = [
+    ([[1, 1, 1, 1]], "#35c9ff"),
+    ([[1, 1], [1, 1]], "#f2d74e"),
+    ([[0, 1, 0], [1, 1, 1]], "#b76cff"),
+    ([[1, 0, 0], [1, 1, 1]], "#4e7af2"),
+    ([[0, 0, 1], [1, 1, 1]], "#f29b4e"),
+    ([[0, 1, 1], [1, 1, 0]], "#4ef27a"),
+    ([[1, 1, 0], [0, 1, 1]], "#f24e4e"),
+]
+
+LINE_SCORES = {1: 100, 2: 300, 3: 500, 4: 800}
+DAS = 0.167
+ARR = 0.033
+
+LEFT = "left"
+RIGHT = "right"
+ROTATE = "rotate"
+SOFT_DROP_START = "soft_drop_start"
+SOFT_DROP_STOP = "soft_drop_stop"
+HARD_DROP = "hard_drop"
+DRAG = "drag"
+LEFT_PRESS = "left_press"
+LEFT_RELEASE = "left_release"
+RIGHT_PRESS = "right_press"
+RIGHT_RELEASE = "right_release"
+UNDO = "undo"
+
+SHIFTS = {LEFT_PRESS: -1, RIGHT_PRESS: 1, LEFT_RELEASE: -1, RIGHT_RELEASE: 1}
+RELEASES = {LEFT_PRESS: LEFT_RELEASE, RIGHT_PRESS: RIGHT_RELEASE, SOFT_DROP_START: SOFT_DROP_STOP}
+
+
+JLSTZ_KICKS = {
+    (0, 1): ((0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)),
+    (1, 0): ((0, 0), (1, 0), (1, -1), (0, 2), (1, 2)),
+    (1, 2): ((0, 0), (1, 0), (1, -1), (0, 2), (1, 2)),
+    (2, 1): ((0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)),
+    (2, 3): ((0, 0), (1, 0), (1, 1), (0, -2), (1, -2)),
+    (3, 2): ((0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)),
+    (3, 0): ((0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)),
+    (0, 3): ((0, 0), (1, 0), (1, 1), (0, -2), (1, -2)),
+}
+
+I_KICKS = {
+    (0, 1): ((0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)),
+    (1, 0): ((0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)),
+    (1, 2): ((0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)),
+    (2, 1): ((0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)),
+    (2, 3): ((0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)),
+    (3, 2): ((0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)),
+    (3, 0): ((0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)),
+    (0, 3): ((0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)),
+}
+
+RotationState = namedtuple("RotationState", "cells masks left right top bottom profile")
+Snapshot = namedtuple(
+    "Snapshot",
+    "cells rows tops piece next_kind drawn score lines level pieces drop_interval time last_drop game_over",
+)
+
+
+def rotate(shape):
+    return [list(row) for row in zip(*shape[::-1])]
+
+
+def spawn_box(shape):
+    size = max(len(shape), len(shape[0]))
+    top = 1 if size == 4 else 0
+    box = [[0] * size for _ in range(size)]
+    for r, row in enumerate(shape):
+        for c, val in enumerate(row):
+            box[top + r][c] = val
+    return box
+
+
+def rotation_state(box):
+    cells = tuple((c, r) for r, row in enumerate(box) for c, val in enumerate(row) if val)
+    left = min(c for c, _r in cells)
+    columns = sorted({c for c, _r in cells})
+    profile = tuple(
+        (c, min(r for cc, r in cells if cc == c), max(r for cc, r in cells if cc == c)) for c in columns
+    )
+    masks = tuple(
+        (r, sum(1 << (c - left) for c, val in enumerate(row) if val))
+        for r, row in enumerate(box)
+        if any(row)
+    )
+    return RotationState(
+        cells,
+        masks,
+        left,
+        max(c for c, _r in cells),
+        min(r for _c, r in cells),
+        max(r for _c, r in cells),
+        profile,
+    )
+
+
+def build_rotations(shape):
+    box = spawn_box(shape)
+    states = []
+    for _ in range(4):
+        states.append(rotation_state(box))
+        box = rotate(box)
+    return tuple(states)
+
+
+def build_kicks(shape):
+    size = max(len(shape), len(shape[0]))
+    if size == 2:
+        table = {}
+    else:
+        table = I_KICKS if size == 4 else JLSTZ_KICKS
+    kicks = {}
+    for rotation in range(4):
+        for target in ((rotation + 1) % 4, (rotation - 1) % 4):
+            offsets = table.get((rotation, target), ((0, 0),))
+            kicks[rotation, target] = tuple((dx, -dy) for dx, dy in offsets)
+    return kicks
+
+
+ROTATIONS = tuple(build_rotations(shape) for shape, _color in SHAPES)
+KICKS = tuple(build_kicks(shape) for shape, _color in SHAPES)
+COLORS = tuple(color for _shape, color in SHAPES)
+GARBAGE_COLOR = "#5b6478"
+PALETTE = (None,) + COLORS + (GARBAGE_COLOR,)
+COLOR_INDEX = {color: index for index, color in enumerate(PALETTE)}
+
+
+class Piece:
+    __slots__ = ("kind", "rotation", "x", "y")
+
+    def __init__(self, kind, rotation=0, x=0, y=0):
+        self.kind = kind
+        self.rotation = rotation
+        self.x = x
+        self.y = y
+
+    def spawn(self, kind, cols=COLS):
+        state = ROTATIONS[kind][0]
+        width = state.right - state.left + 1
+        self.kind = kind
+        self.rotation = 0
+        self.x = cols // 2 - width // 2 - state.left
+        self.y = -(state.bottom - state.top + 1) - state.top
+        return self
+
+    @property
+    def state(self):
+        return ROTATIONS[self.kind][self.rotation]
+
+    @property
+    def color(self):
+        return COLORS[self.kind]
+
+    def cells(self):
+        x = self.x
+        y = self.y
+        return [(x + c, y + r) for c, r in ROTATIONS[self.kind][self.rotation].cells]
+
+    def key(self):
+        return (self.kind, self.rotation, self.x, self.y)
+
+
+class GameState:
+    def __init__(self, seed=None, events=False, history=0, width=COLS, height=ROWS, das=DAS, arr=ARR):
+        if arr <= 0:
+            raise ValueError(f"ARR must be positive, got {arr}")
+        self.rng = random.Random(seed)
+        self.width = width
+        self.height = height
+        self.full_row = (1 << width) - 1
+        self.empty_cells = bytes(width)
+        self.base_interval = 0.55
+        self.soft_drop_interval = 0.05
+        self.das = das
+        self.arr = arr
+        self.events = [] if events else None
+        self.inputs = deque()
+        self.sequence = bytearray()
+        self.history = deque(maxlen=history) if history else None
+        self.reset()
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.rng.seed(seed)
+        self.grid = [[None] * self.width for _ in range(self.height)]
+        self.rows = [0] * self.height
+        self.tops = [self.height] * self.width
+        self.board_version = 0
+        self.ghost_cache = None
+        self.score = 0
+        self.lines = 0
+        self.level = 1
+        self.pieces = 0
+        self.game_over = False
+        self.drop_interval = self.base_interval
+        self.time = 0.0
+        self.last_drop = 0.0
+        self.soft_drop_active = False
+        self.held = []
+        self.shift_dir = 0
+        self.shift_next = None
+        self.garbage = []
+        self.inputs.clear()
+        if self.events is not None:
+            self.events.clear()
+        self.sequence.clear()
+        self.drawn = 0
+        self.current = self.new_piece()
+        self.next_piece = self.new_piece()
+        if self.history is not None:
+            self.history.clear()
+            self.history.append(self.snapshot())
+
+    def emit(self, *event):
+        if self.events is not None:
+            self.events.append(event)
+
+    def drain_events(self):
+        events = self.events
+        if not events:
+            return []
+        self.events = []
+        return events
+
+    def new_piece(self, piece=None):
+        if piece is None:
+            piece = Piece(0)
+        sequence = self.sequence
+        if self.drawn < len(sequence):
+            kind = sequence[self.drawn]
+        else:
+            kind = self.rng.randrange(len(SHAPES))
+            sequence.append(kind)
+        self.drawn += 1
+        return piece.spawn(kind, self.width)
+
+    def encode_cells(self):
+        index = COLOR_INDEX
+        empty = self.empty_cells
+        return b"".join(
+            [bytes([index[color] for color in row]) if mask else empty for row, mask in zip(self.grid, self.rows)]
+        )
+
+    def snapshot(self):
+        return Snapshot(
+            self.encode_cells(),
+            tuple(self.rows),
+            tuple(self.tops),
+            self.current.key(),
+            self.next_piece.kind,
+            self.drawn,
+            self.score,
+            self.lines,
+            self.level,
+            self.pieces,
+            self.drop_interval,
+            self.time,
+            self.last_drop,
+            self.game_over,
+        )
+
+    def restore(self, snapshot):
+        cells = snapshot.cells
+        rows = snapshot.rows
+        width = self.width
+        self.grid = [
+            [PALETTE[value] for value in cells[r * width : r * width + width]] if rows[r] else [None] * width
+            for r in range(self.height)
+        ]
+        self.rows[:] = rows
+        self.tops[:] = snapshot.tops
+        self.board_version += 1
+        piece = self.current
+        piece.kind, piece.rotation, piece.x, piece.y = snapshot.piece
+        self.next_piece.spawn(snapshot.next_kind, width)
+        self.drawn = snapshot.drawn
+        self.score = snapshot.score
+        self.lines = snapshot.lines
+        self.level = snapshot.level
+        self.pieces = snapshot.pieces
+        self.drop_interval = snapshot.drop_interval
+        self.time = snapshot.time
+        self.last_drop = snapshot.last_drop
+        self.game_over = snapshot.game_over
+        self.soft_drop_active = False
+        self.held = []
+        self.shift_dir = 0
+        self.shift_next = None
+
+    def undo(self):
+        history = self.history
+        if not history or len(history) < 2:
+            return False
+        history.pop()
+        now = self.time
+        self.restore(history[-1])
+        self.time = now
+        self.last_drop = now
+        self.emit("undo")
+        return True
+
+    def collides(self, kind, rotation, x, y):
+        state = ROTATIONS[kind][rotation]
+        left = x + state.left
+        if left < 0 or x + state.right >= self.width or y + state.bottom >= self.height:
+            return True
+        rows = self.rows
+        for r, mask in state.masks:
+            ny = y + r
+            if ny >= 0 and rows[ny] & (mask << left):
+                return True
+        return False
+
+    def move(self, dx, dy):
+        if self.game_over:
+            return False
+        piece = self.current
+        nx = piece.x + dx
+        ny = piece.y + dy
+        if not self.collides(piece.kind, piece.rotation, nx, ny):
+            piece.x = nx
+            piece.y = ny
+            return True
+        return False
+
+    def rotate_piece(self, direction=1):
+        if self.game_over:
+            return False
+        piece = self.current
+        kind = piece.kind
+        rotation = (piece.rotation + direction) % 4
+        for dx, dy in KICKS[kind][piece.rotation, rotation]:
+            if not self.collides(kind, rotation, piece.x + dx, piece.y + dy):
+                piece.x += dx
+                piece.y += dy
+                piece.rotation = rotation
+                return True
+        return False
+
+    def drag_to(self, target_col):
+        if self.game_over:
+            return False
+        piece = self.current
+        state = piece.state
+        piece_w = state.right - state.left + 1
+        new_x = int(target_col - piece_w // 2)
+        new_x = max(0, min(self.width - piece_w, new_x)) - state.left
+        step = 1 if new_x > piece.x else -1
+        x = piece.x
+        while x != new_x and not self.collides(piece.kind, piece.rotation, x + step, piece.y):
+            x += step
+        if x == piece.x:
+            return False
+        piece.x = x
+        return True
+
+    def press_shift(self, direction):
+        if direction in self.held:
+            return False
+        self.held.append(direction)
+        self.shift_dir = direction
+        self.shift_next = self.time + self.das
+        return self.move(direction, 0)
+
+    def release_shift(self, direction):
+        if direction not in self.held:
+            return False
+        self.held.remove(direction)
+        if self.shift_dir == direction:
+            if self.held:
+                self.shift_dir = self.held[-1]
+                self.shift_next = self.time + self.das
+            else:
+                self.shift_dir = 0
+                self.shift_next = None
+        return True
+
+    def release_all(self):
+        for direction in list(self.held):
+            self.apply_input(LEFT_RELEASE if direction < 0 else RIGHT_RELEASE)
+        if self.soft_drop_active:
+            self.apply_input(SOFT_DROP_STOP)
+
+    def set_soft_drop(self, active):
+        self.soft_drop_active = active
+
+    def hard_drop(self):
+        if self.game_over:
+            return 0
+        piece = self.current
+        distance = self.ghost_y() - piece.y
+        piece.y += distance
+        self.score += distance * 2
+        self.lock_piece()
+        return distance
+
+    def rebuild_index(self):
+        rows = self.rows
+        height = self.height
+        for c in range(self.width):
+            bit = 1 << c
+            y = 0
+            while y < height and not rows[y] & bit:
+                y += 1
+            self.tops[c] = y
+        self.board_version += 1
+
+    def column_heights(self):
+        return [self.height - top for top in self.tops]
+
+    def stack_height(self):
+        return self.height - min(self.tops)
+
+    def ghost_y(self):
+        piece = self.current
+        key = (piece.kind, piece.rotation, piece.x, piece.y, self.board_version)
+        cache = self.ghost_cache
+        if cache is not None and cache[0] == key:
+            return cache[1]
+        y = self.surface_drop_y(piece)
+        if y is None:
+            y = self.scan_drop_y(piece)
+        self.ghost_cache = (key, y)
+        return y
+
+    def surface_drop_y(self, piece):
+        tops = self.tops
+        x = piece.x
+        y = piece.y
+        landing = self.height
+        for c, _top, bottom in piece.state.profile:
+            top = tops[x + c]
+            if top <= y + bottom:
+                return None
+            landing = min(landing, top - 1 - bottom)
+        return landing
+
+    def scan_drop_y(self, piece):
+        state = piece.state
+        left = piece.x + state.left
+        masks = [(r, mask << left) for r, mask in state.masks]
+        rows = self.rows
+        y = piece.y
+        bottom = self.height - 1 - state.bottom
+        while y < bottom:
+            ny = y + 1
+            for r, mask in masks:
+                if ny + r >= 0 and rows[ny + r] & mask:
+                    return y
+            y = ny
+        return y
+
+    def lock_piece(self):
+        piece = self.current
+        state = piece.state
+        y = piece.y
+        if y + state.top < 0:
+            self.end_game()
+            return
+
+        color = piece.color
+        grid = self.grid
+        rows = self.rows
+        left = piece.x + state.left
+        for r, mask in state.masks:
+            rows[y + r] |= mask << left
+        for c, r in state.cells:
+            grid[y + r][piece.x + c] = color
+        tops = self.tops
+        for c, top, _bottom in state.profile:
+            col = piece.x + c
+            if y + top < tops[col]:
+                tops[col] = y + top
+        self.board_version += 1
+        self.pieces += 1
+        if self.events is not None:
+            self.events.append(("lock", color, piece.cells()))
+
+        self.clear_lines(range(y + state.top, y + state.bottom + 1))
+        overflow = self.raise_garbage() if self.garbage else False
+        self.current = self.next_piece
+        self.next_piece = self.new_piece(piece)
+        current = self.current
+        if overflow or self.collides(current.kind, current.rotation, current.x, current.y):
+            self.end_game()
+        elif self.history is not None:
+            self.history.append(self.snapshot())
+
+    def clear_lines(self, candidates=None):
+        rows = self.rows
+        if candidates is None:
+            candidates = range(self.height)
+        full_row = self.full_row
+        cleared_rows = [i for i in candidates if rows[i] == full_row]
+        if not cleared_rows:
+            return cleared_rows
+
+        for i in cleared_rows:
+            del rows[i]
+            del self.grid[i]
+            rows.insert(0, 0)
+            self.grid.insert(0, [None] * self.width)
+
+        tops = self.tops
+        first = min(cleared_rows)
+        count = len(cleared_rows)
+        height = self.height
+        for c in range(self.width):
+            top = tops[c]
+            if top < first:
+                tops[c] = top + count
+                continue
+            bit = 1 << c
+            top = first + count - 1
+            while top < height and not rows[top] & bit:
+                top += 1
+            tops[c] = top
+        self.board_version += 1
+
+        self.lines += len(cleared_rows)
+        self.score += LINE_SCORES.get(len(cleared_rows), len(cleared_rows) * 200)
+        self.level = 1 + self.lines // 10
+        self.drop_interval = max(0.08, self.base_interval - (self.level - 1) * 0.05)
+        self.emit("clear", cleared_rows)
+        return cleared_rows
+
+    def add_garbage(self, count, hole):
+        if not self.game_over:
+            self.garbage.append((count, hole))
+
+    def raise_garbage(self):
+        height = self.height
+        rows = self.rows
+        grid = self.grid
+        tops = self.tops
+        overflow = False
+        for count, hole in self.garbage:
+            count = min(count, height)
+            if min(tops) < count:
+                overflow = True
+            row = self.full_row & ~(1 << hole)
+            cells = [GARBAGE_COLOR] * self.width
+            cells[hole] = None
+            del rows[:count]
+            del grid[:count]
+            rows.extend([row] * count)
+            grid.extend(cells[:] for _ in range(count))
+            for c in range(self.width):
+                top = tops[c]
+                if top < height:
+                    tops[c] = max(0, top - count)
+                elif c != hole:
+                    tops[c] = height - count
+        self.garbage.clear()
+        if overflow:
+            self.rebuild_index()
+        else:
+            self.board_version += 1
+        return overflow
+
+    def end_game(self):
+        self.game_over = True
+        self.emit("game_over")
+
+    def gravity_interval(self):
+        return self.soft_drop_interval if self.soft_drop_active else self.drop_interval
+
+    def next_drop_at(self):
+        return self.last_drop + self.gravity_interval()
+
+    def next_event_at(self):
+        deadline = self.next_drop_at()
+        if self.shift_next is not None and self.shift_next < deadline:
+            return self.shift_next
+        return deadline
+
+    def step(self):
+        if self.game_over:
+            return False
+        if self.move(0, 1):
+            return True
+        self.lock_piece()
+        return False
+
+    def queue_input(self, time, action, arg=None):
+        inputs = self.inputs
+        if inputs:
+            last = inputs[-1][1]
+            if action == DRAG and last == DRAG:
+                inputs.pop()
+            elif RELEASES.get(action) == last:
+                inputs.pop()
+                return
+        inputs.append((time, action, arg))
+
+    def advance(self, now):
+        inputs = self.inputs
+        while not self.game_over:
+            event = self.next_drop_at()
+            kind = 0
+            if self.shift_next is not None and self.shift_next < event:
+                event = self.shift_next
+                kind = 1
+            if inputs and inputs[0][0] < event:
+                event = inputs[0][0]
+                kind = 2
+            if now < event:
+                break
+            self.time = event
+            if kind == 0:
+                self.last_drop = event
+                self.step()
+            elif kind == 1:
+                self.shift_next = event + self.arr
+                self.move(self.shift_dir, 0)
+            else:
+                _time, action, arg = inputs.popleft()
+                self.apply_input(action, arg)
+        if self.game_over:
+            inputs.clear()
+        self.time = now
+
+    def apply_input(self, action, arg=None):
+        if self.events is not None and not self.game_over:
+            self.events.append(("input", self.time, action, arg))
+        if action == LEFT:
+            return self.move(-1, 0)
+        if action == RIGHT:
+            return self.move(1, 0)
+        if action == ROTATE:
+            return self.rotate_piece()
+        if action == HARD_DROP:
+            return self.hard_drop()
+        if action == SOFT_DROP_START:
+            self.set_soft_drop(True)
+            return True
+        if action == SOFT_DROP_STOP:
+            self.set_soft_drop(False)
+            return True
+        if action == DRAG:
+            return self.drag_to(arg)
+        if action == LEFT_PRESS or action == RIGHT_PRESS:
+            return self.press_shift(SHIFTS[action])
+        if action == LEFT_RELEASE or action == RIGHT_RELEASE:
+            return self.release_shift(SHIFTS[action])
+        if action == UNDO:
+            return self.undo()
+        raise ValueError(f"Unknown input: {action}")
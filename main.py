@@ -1,6 +1,10 @@
-﻿import tkinter as tk
+﻿import sqlite3
+import threading
+import tkinter as tk
 from tkinter import messagebox
 
+from stats import StatsStore, format_game
+
 try:
     from PIL import Image, ImageTk
 except ImportError:
@@ -12,6 +16,107 @@ def show_popup(title, message):
     messagebox.showinfo(title, message)
 
 
+def show_table(root, title, header, lines):
+    window = tk.Toplevel(root)
+    window.title(title)
+    window.resizable(False, False)
+    tk.Label(window, text=header, font=("Segoe UI", 12, "bold")).pack(padx=16, pady=(14, 6))
+    tk.Label(
+        window,
+        text="\n".join(lines) or "No games recorded yet.",
+        font=("Consolas", 10),
+        justify="left",
+    ).pack(padx=16, pady=(0, 8))
+    tk.Button(window, text="Close", width=10, command=window.destroy).pack(pady=(0, 12))
+
+
+class Preloader:
+    def __init__(self, root):
+        self.root = root
+        self.thread = None
+        self.module = None
+        self.images = None
+        self.error = None
+        self.queued = False
+        self.jobs = []
+        self.background = None
+        self.sprites = {}
+        self.poll_id = None
+        self.done = False
+
+    def start(self):
+        if self.done:
+            return
+        self.thread = threading.Thread(target=self.load, daemon=True)
+        self.thread.start()
+        self.poll_id = self.root.after(50, self.poll)
+
+    def load(self):
+        try:
+            import tetris
+
+            self.images = tetris.load_assets()
+            self.module = tetris
+        except Exception as exc:
+            self.error = exc
+
+    def poll(self):
+        self.poll_id = None
+        if self.done:
+            return
+        if self.thread.is_alive():
+            self.poll_id = self.root.after(50, self.poll)
+            return
+        self.queue_jobs()
+        if self.jobs:
+            self.poll_id = self.root.after_idle(self.convert_next)
+
+    def queue_jobs(self):
+        if self.queued:
+            return
+        self.queued = True
+        if self.error:
+            print(f"Preloading failed: {self.error}")
+            return
+        if not self.module.ImageTk:
+            return
+        if self.images["background"] is not None:
+            self.jobs.append((None, self.images["background"]))
+        self.jobs.extend(self.images["sprites"].items())
+
+    def convert_next(self):
+        self.poll_id = None
+        if self.jobs:
+            self.convert(*self.jobs.pop(0))
+        if self.jobs:
+            self.poll_id = self.root.after(1, self.convert_next)
+
+    def convert(self, key, img):
+        photo = self.module.ImageTk.PhotoImage(img)
+        if key is None:
+            self.background = photo
+        else:
+            self.sprites[key] = photo
+
+    def finish(self):
+        self.done = True
+        if self.thread is None:
+            return None
+        if self.poll_id is not None:
+            self.root.after_cancel(self.poll_id)
+            self.poll_id = None
+        self.thread.join()
+        self.queue_jobs()
+        if self.error or not self.module.ImageTk:
+            return None
+        while self.jobs:
+            self.convert(*self.jobs.pop(0))
+        return {
+            "background": self.background,
+            "atlas": self.module.SpriteAtlas(images=self.sprites),
+        }
+
+
 def main():
     root = tk.Tk()
     root.title("Game Main Menu")
@@ -37,16 +142,51 @@ def main():
         root.lift()
         root.focus_force()
 
+    preloader = Preloader(root)
+    store = StatsStore()
+    game = None
+
     def start_game():
+        nonlocal game
         root.withdraw()
         try:
+            if game is not None and game.root.winfo_exists():
+                game.show()
+                return
+            assets = preloader.finish()
             import tetris
 
-            tetris.main(parent=root, on_close=restore_menu)
+            game = tetris.main(parent=root, on_close=restore_menu, assets=assets, reusable=True, stats=store)
         except Exception as exc:
             restore_menu()
             messagebox.showerror("Error", f"Failed to start Tetris: {exc}")
 
+    def start_versus():
+        root.withdraw()
+        try:
+            import multiboard
+
+            multiboard.main(parent=root, on_close=restore_menu, count=2, humans=2, versus=True)
+        except Exception as exc:
+            restore_menu()
+            messagebox.showerror("Error", f"Failed to start versus mode: {exc}")
+
+    def show_stats(title, query):
+        try:
+            header, lines = query()
+        except (OSError, sqlite3.Error) as exc:
+            messagebox.showerror("Error", f"Failed to read stats: {exc}")
+            return
+        show_table(root, title, header, lines)
+
+    def high_scores():
+        games = store.high_scores(limit=10)
+        return "Best games", [format_game(game, rank) for rank, game in enumerate(games, 1)]
+
+    def history():
+        games = store.history(limit=20)
+        return f"{store.count()} games played", [format_game(game) for game in games]
+
     title_label = tk.Label(
         root,
         text="Main Menu",
@@ -60,6 +200,9 @@ def main():
 
     buttons = [
         ("Start Game", start_game),
+        ("Versus", start_versus),
+        ("High Scores", lambda: show_stats("High Scores", high_scores)),
+        ("History", lambda: show_stats("History", history)),
         ("Options", lambda: show_popup("Options", "Options menu coming soon.")),
         ("Credits", lambda: show_popup("Credits", "Made with Python.")),
         ("Help", lambda: show_popup("Help", "Use the menu to navigate.")),
@@ -76,7 +219,9 @@ def main():
         )
         btn.pack(pady=6)
 
+    root.after_idle(lambda: root.after(100, preloader.start))
     root.mainloop()
+    store.close()
 
 
 if __name__ == "__main__":
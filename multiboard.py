@@ -0,0 +1,549 @@
+﻿import argparse
+import heapq
+import math
+import random
+import time
+import tkinter as tk
+
+from autoplay import Autoplayer
+from engine import (
+    COLS,
+    HARD_DROP,
+    LEFT_PRESS,
+    LEFT_RELEASE,
+    RIGHT_PRESS,
+    RIGHT_RELEASE,
+    ROTATE,
+    ROTATIONS,
+    ROWS,
+    SOFT_DROP_START,
+    SOFT_DROP_STOP,
+    GameState,
+)
+from tetris import (
+    ACCENT,
+    BG_COLOR,
+    BOARD_COLOR,
+    CELL,
+    GRID_COLOR,
+    MARGIN,
+    MIN_CELL,
+    MUTED_TEXT,
+    TEXT_COLOR,
+    Framebuffer,
+    FrameLoop,
+    ImageTk,
+    TileGrid,
+    shade_color,
+)
+
+MAX_WALL_W = 1280
+MAX_WALL_H = 800
+GAP = 14
+LABEL_H = 20
+STATUS_H = 24
+GARBAGE_LINES = {2: 1, 3: 2, 4: 4}
+KEYMAPS = (
+    {
+        "<KeyPress-Left>": LEFT_PRESS,
+        "<KeyRelease-Left>": LEFT_RELEASE,
+        "<KeyPress-Right>": RIGHT_PRESS,
+        "<KeyRelease-Right>": RIGHT_RELEASE,
+        "<KeyPress-Up>": ROTATE,
+        "<KeyPress-Down>": SOFT_DROP_START,
+        "<KeyRelease-Down>": SOFT_DROP_STOP,
+        "<KeyPress-Return>": HARD_DROP,
+    },
+    {
+        "<KeyPress-a>": LEFT_PRESS,
+        "<KeyRelease-a>": LEFT_RELEASE,
+        "<KeyPress-d>": RIGHT_PRESS,
+        "<KeyRelease-d>": RIGHT_RELEASE,
+        "<KeyPress-w>": ROTATE,
+        "<KeyPress-s>": SOFT_DROP_START,
+        "<KeyRelease-s>": SOFT_DROP_STOP,
+        "<KeyPress-space>": HARD_DROP,
+    },
+)
+
+
+class Board:
+    def __init__(self, index, human=False, lookahead=True):
+        self.index = index
+        self.name = f"P{index + 1}"
+        self.human = human
+        self.state = GameState(events=True)
+        self.bot = None if human else Autoplayer(lookahead=lookahead)
+        self.bot_interval = 0.05
+        self.wins = 0
+        self.deadline = None
+        self.reset(None, 0.0)
+
+    def reset(self, seed, now):
+        self.state.reset(seed)
+        self.started = now
+        self.flash_rows = []
+        self.flash_until = None
+        self.restart_at = None
+        self.banner = None
+        self.bot_actions = []
+        self.bot_pieces = None
+        self.bot_next = 0.0 if self.bot else None
+
+    def next_deadline(self):
+        state = self.state
+        if state.game_over:
+            return self.restart_at
+        deadline = state.next_event_at()
+        if self.flash_until is not None:
+            deadline = min(deadline, self.flash_until)
+        if self.bot_next is not None:
+            deadline = min(deadline, self.bot_next)
+        return self.started + deadline
+
+    def bot_step(self, now):
+        if self.bot_next is None or now < self.bot_next:
+            return
+        state = self.state
+        if state.pieces != self.bot_pieces or not self.bot_actions:
+            self.bot_actions = self.bot.plan(state)
+            self.bot_pieces = state.pieces
+        if self.bot_actions and not state.apply_input(self.bot_actions.pop(0)):
+            self.bot_actions = []
+        self.bot_next = now + self.bot_interval
+
+
+class BoardSlot:
+    def __init__(self, board, x, y):
+        self.board = board
+        self.x = x
+        self.y = y
+        self.tiles = None
+        self.label_key = None
+        self.banner_key = None
+
+
+class ItemGrid(TileGrid):
+    def __init__(self, canvas, x, y, cell):
+        super().__init__(COLS, ROWS)
+        self.canvas = canvas
+        canvas.create_rectangle(x, y, x + COLS * cell, y + ROWS * cell, fill=BOARD_COLOR, outline="")
+        self.items = [
+            [
+                canvas.create_rectangle(
+                    x + c * cell,
+                    y + r * cell,
+                    x + (c + 1) * cell - 1,
+                    y + (r + 1) * cell - 1,
+                    fill=BOARD_COLOR,
+                    outline=GRID_COLOR,
+                )
+                for c in range(COLS)
+            ]
+            for r in range(ROWS)
+        ]
+
+    def draw(self, grid, top, overlay, rows=None):
+        changes = super().draw(grid, top, overlay, rows)
+        for c, s, (color, style) in changes:
+            if style == "block":
+                style = {"fill": color, "outline": shade_color(color, 0.7)}
+            elif style == "ghost":
+                style = {"fill": BOARD_COLOR, "outline": shade_color(color, 0.35)}
+            elif style == "flash":
+                style = {"fill": shade_color(ACCENT, 1.4), "outline": ACCENT}
+            else:
+                style = {"fill": BOARD_COLOR, "outline": GRID_COLOR}
+            self.canvas.itemconfigure(self.items[s][c], **style)
+        return changes
+
+
+class WallRenderer:
+    def __init__(self, wall):
+        self.wall = wall
+        self.canvas = wall.canvas
+        self.cell = wall.cell
+        self.images = bool(ImageTk)
+        self.tiles = {}
+        self.slots = [BoardSlot(board, *wall.board_origin(board.index)) for board in wall.boards]
+        if self.images:
+            self.scratch = ImageTk.PhotoImage("RGB", (wall.board_w, wall.board_h))
+        for slot in self.slots:
+            self.build_slot(slot)
+
+    def build_slot(self, slot):
+        canvas = self.canvas
+        wall = self.wall
+        cell = self.cell
+        if self.images:
+            slot.tiles = Framebuffer(canvas, slot.x, slot.y, COLS, ROWS, cell, self.tiles, self.scratch)
+        else:
+            slot.tiles = ItemGrid(canvas, slot.x, slot.y, cell)
+        slot.label = canvas.create_text(
+            slot.x,
+            slot.y + wall.board_h + 4,
+            anchor="nw",
+            fill=MUTED_TEXT,
+            font=("Segoe UI", 9),
+        )
+        slot.banner = canvas.create_text(
+            slot.x + wall.board_w // 2,
+            slot.y + wall.board_h // 2,
+            fill=ACCENT,
+            font=("Segoe UI", 14, "bold"),
+            state="hidden",
+        )
+
+    def render(self, boards):
+        for board in boards:
+            slot = self.slots[board.index]
+            self.draw_board(slot)
+            self.draw_label(slot)
+
+    def build_overlay(self, board):
+        state = board.state
+        overlay = {}
+        if not state.game_over:
+            piece = state.current
+            color = piece.color
+            for c, r in ROTATIONS[piece.kind][piece.rotation].cells:
+                overlay[piece.x + c, state.ghost_y() + r] = (color, "ghost")
+            for c, r in piece.cells():
+                overlay[c, r] = (color, "block")
+        for r in board.flash_rows:
+            for c in range(COLS):
+                overlay[c, r] = (None, "flash")
+        return overlay
+
+    def draw_board(self, slot):
+        slot.tiles.draw(slot.board.state.grid, 0, self.build_overlay(slot.board))
+
+    def draw_label(self, slot):
+        board = slot.board
+        state = board.state
+        key = (state.score, state.lines, board.wins)
+        if key != slot.label_key:
+            slot.label_key = key
+            text = f"{board.name}  {state.score:,}  lines {state.lines}"
+            if self.wall.versus:
+                text += f"  wins {board.wins}"
+            self.canvas.itemconfigure(slot.label, text=text)
+        if board.banner != slot.banner_key:
+            slot.banner_key = board.banner
+            if board.banner:
+                self.canvas.itemconfigure(slot.banner, text=board.banner, state="normal")
+            else:
+                self.canvas.itemconfigure(slot.banner, state="hidden")
+
+
+class MultiBoard(FrameLoop):
+    def __init__(
+        self,
+        root,
+        count=4,
+        humans=0,
+        versus=False,
+        seed=None,
+        columns=None,
+        cell=None,
+        lookahead=True,
+        on_close=None,
+        owns_root=True,
+    ):
+        self.root = root
+        self.on_close = on_close
+        self.owns_root = owns_root
+        self.versus = versus
+        self.rng = random.Random(seed)
+        self.boards = [Board(i, human=i < humans, lookahead=lookahead) for i in range(count)]
+
+        self.columns = columns or math.ceil(math.sqrt(count))
+        lines = math.ceil(count / self.columns)
+        fit_w = (MAX_WALL_W - MARGIN * 2 - GAP * (self.columns - 1)) // (self.columns * COLS)
+        fit_h = (MAX_WALL_H - MARGIN * 2 - STATUS_H - (LABEL_H + GAP) * lines) // (lines * ROWS)
+        self.cell = cell or max(MIN_CELL, min(CELL, fit_w, fit_h))
+        self.board_w = COLS * self.cell
+        self.board_h = ROWS * self.cell
+        self.canvas_w = MARGIN * 2 + self.columns * (self.board_w + GAP) - GAP
+        self.canvas_h = MARGIN * 2 + lines * (self.board_h + LABEL_H + GAP) + STATUS_H
+
+        self.root.title("Tetris Versus" if versus else "Tetris Wall")
+        self.root.resizable(False, False)
+        self.canvas = tk.Canvas(
+            root,
+            width=self.canvas_w,
+            height=self.canvas_h,
+            bg=BG_COLOR,
+            highlightthickness=0,
+        )
+        self.canvas.pack()
+        self.root.focus_set()
+        self.status = self.canvas.create_text(
+            MARGIN,
+            self.canvas_h - MARGIN - STATUS_H // 2,
+            anchor="w",
+            fill=TEXT_COLOR,
+            font=("Segoe UI", 10),
+        )
+
+        super().__init__()
+        self.running = False
+        self.heap = []
+        self.tick_slack = 0.004
+        self.flash_duration = 0.16
+        self.restart_delay = 2.0
+        self.dirty = set()
+        self.pending = set()
+
+        self.renderer = WallRenderer(self)
+        self.bind_inputs()
+        self.root.protocol("WM_DELETE_WINDOW", self.handle_close)
+        self.restart()
+
+    def board_origin(self, index):
+        line, column = divmod(index, self.columns)
+        return (
+            MARGIN + column * (self.board_w + GAP),
+            MARGIN + line * (self.board_h + LABEL_H + GAP),
+        )
+
+    def bind_inputs(self):
+        humans = [board for board in self.boards if board.human]
+        for board, keymap in zip(humans, KEYMAPS):
+            for sequence, action in keymap.items():
+                self.root.bind(sequence, lambda e, board=board, action=action: self.queue_input(board, action))
+        self.root.bind("<Escape>", lambda e: self.handle_close())
+        self.root.bind("<KeyPress-p>", lambda e: self.toggle_pause())
+        self.root.bind("<KeyPress-r>", lambda e: self.restart())
+
+    def handle_close(self):
+        self.cancel_tick()
+        self.cancel_draw()
+        self.running = False
+        if self.on_close:
+            self.on_close()
+        self.root.destroy()
+
+    @property
+    def paused(self):
+        return self.paused_at is not None
+
+    def set_status(self, text=None):
+        if text is None:
+            text = "P: pause   R: restart   Esc: quit"
+            if self.paused:
+                text = "Paused   " + text
+        self.canvas.itemconfigure(self.status, text=text)
+
+    def restart(self):
+        self.cancel_tick()
+        if self.paused:
+            self.started += time.monotonic() - self.paused_at
+            self.paused_at = None
+        now = self.clock()
+        seed = self.rng.getrandbits(32)
+        for board in self.boards:
+            board.reset(seed if self.versus else self.rng.getrandbits(32), now)
+            self.dirty.add(board)
+        self.heap = []
+        self.pending.clear()
+        for board in self.boards:
+            self.push(board)
+        self.running = True
+        self.set_status()
+        self.request_draw()
+        self.schedule()
+
+    def toggle_pause(self):
+        if not self.running:
+            return
+        now = self.clock()
+        if self.paused:
+            self.started += time.monotonic() - self.paused_at
+            self.paused_at = None
+            self.schedule()
+        else:
+            for board in self.boards:
+                if board.human and not board.state.game_over:
+                    board.state.advance(now - board.started)
+                    board.state.release_all()
+                    self.process_events(board, now)
+            self.settle()
+            self.paused_at = self.started + now
+            self.cancel_tick()
+        self.set_status()
+        self.request_draw()
+
+    def queue_input(self, board, action):
+        if not self.running or self.paused or board.state.game_over:
+            return False
+        board.state.queue_input(self.clock() - board.started, action)
+        self.pending.add(board)
+        self.request_draw()
+        return True
+
+    def push(self, board):
+        deadline = board.next_deadline()
+        board.deadline = deadline
+        if deadline is not None:
+            heapq.heappush(self.heap, (deadline, board.index))
+
+    def update(self, board, now):
+        state = board.state
+        if state.game_over:
+            if board.restart_at is not None and now >= board.restart_at:
+                board.reset(self.rng.getrandbits(32), now)
+                self.dirty.add(board)
+            self.push(board)
+            return
+        local = now - board.started
+        state.advance(local)
+        if board.flash_until is not None and local >= board.flash_until:
+            board.flash_rows = []
+            board.flash_until = None
+        if board.bot:
+            board.bot_step(local)
+        self.process_events(board, now)
+        self.dirty.add(board)
+        self.push(board)
+
+    def process_events(self, board, now):
+        for event in board.state.drain_events():
+            if event[0] == "clear":
+                board.flash_rows = event[1]
+                board.flash_until = now - board.started + self.flash_duration
+                if self.versus:
+                    self.send_garbage(board, len(event[1]))
+            elif event[0] == "game_over":
+                self.board_over(board, now)
+
+    def send_garbage(self, board, cleared):
+        count = GARBAGE_LINES.get(cleared, 0)
+        if not count:
+            return
+        total = len(self.boards)
+        for step in range(1, total):
+            target = self.boards[(board.index + step) % total]
+            if not target.state.game_over:
+                target.state.add_garbage(count, self.rng.randrange(COLS))
+                return
+
+    def board_over(self, board, now):
+        board.banner = "GAME OVER"
+        self.dirty.add(board)
+        if not self.versus:
+            board.restart_at = now + self.restart_delay
+
+    def settle(self):
+        if not self.versus or not self.running:
+            return
+        alive = [board for board in self.boards if not board.state.game_over]
+        if len(alive) > 1:
+            return
+        self.running = False
+        self.cancel_tick()
+        if alive:
+            winner = alive[0]
+            winner.wins += 1
+            winner.banner = "WINNER"
+            self.dirty.add(winner)
+            self.set_status(f"{winner.name} wins!   R: rematch   Esc: quit")
+        else:
+            self.set_status("Game over   R: rematch   Esc: quit")
+        self.request_draw()
+
+    def next_deadline(self):
+        if not self.heap:
+            return None
+        return self.heap[0][0] + self.tick_slack
+
+    def tick(self):
+        self.tick_id = None
+        self.tick_deadline = None
+        if not self.running or self.paused:
+            return
+        now = self.clock()
+        heap = self.heap
+        boards = self.boards
+        due = []
+        while heap and heap[0][0] <= now:
+            deadline, index = heapq.heappop(heap)
+            board = boards[index]
+            if deadline == board.deadline:
+                board.deadline = None
+                due.append(board)
+        for board in self.pending.difference(due):
+            self.update(board, now)
+        self.pending.clear()
+        for board in due:
+            self.update(board, now)
+        self.settle()
+        if self.dirty:
+            self.request_draw()
+        self.schedule()
+
+    def flush_draw(self):
+        self.draw_id = None
+        if self.pending and self.running and not self.paused:
+            now = self.clock()
+            for board in self.pending:
+                if not board.state.game_over:
+                    board.state.advance(now - board.started)
+                    self.process_events(board, now)
+                    self.dirty.add(board)
+                    self.push(board)
+            self.settle()
+            self.schedule()
+        self.pending.clear()
+        self.last_draw = time.monotonic()
+        dirty = sorted(self.dirty, key=lambda board: board.index)
+        self.dirty.clear()
+        self.renderer.render(dirty)
+
+
+def main(parent=None, on_close=None, count=4, humans=0, versus=False, seed=None, columns=None, lookahead=True):
+    if parent is None:
+        root = tk.Tk()
+        owns_root = True
+    else:
+        root = tk.Toplevel(parent)
+        owns_root = False
+
+    wall = MultiBoard(
+        root,
+        count=count,
+        humans=humans,
+        versus=versus,
+        seed=seed,
+        columns=columns,
+        lookahead=lookahead,
+        on_close=on_close,
+        owns_root=owns_root,
+    )
+
+    if owns_root:
+        root.mainloop()
+    return wall
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Run several Tetris boards in one window.")
+    parser.add_argument("-n", "--boards", type=int, default=4, help="number of boards")
+    parser.add_argument("--humans", type=int, choices=range(len(KEYMAPS) + 1), default=0, help="keyboard players")
+    parser.add_argument("--versus", action="store_true", help="send garbage lines between boards, last one standing wins")
+    parser.add_argument("-s", "--seed", type=int, help="seed for the boards and the garbage holes")
+    parser.add_argument("-c", "--columns", type=int, help="boards per row")
+    parser.add_argument("--greedy", action="store_true", help="bots skip the next-piece lookahead")
+    args = parser.parse_args(argv)
+    main(
+        count=max(args.boards, args.humans, 1),
+        humans=args.humans,
+        versus=args.versus,
+        seed=args.seed,
+        columns=args.columns,
+        lookahead=not args.greedy,
+    )
+
+
+if __name__ == "__main__":
+    cli()
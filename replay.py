@@ -0,0 +1,226 @@
+﻿import argparse
+import struct
+import time
+
+from engine import (
+    ARR,
+    COLS,
+    DAS,
+    DRAG,
+    HARD_DROP,
+    LEFT,
+    LEFT_PRESS,
+    LEFT_RELEASE,
+    RIGHT,
+    RIGHT_PRESS,
+    RIGHT_RELEASE,
+    ROTATE,
+    ROWS,
+    SOFT_DROP_START,
+    SOFT_DROP_STOP,
+    UNDO,
+    GameState,
+)
+
+MAGIC = b"TRPL"
+VERSION = 4
+HEADERS = {1: "<BQ", 2: "<BQH", 3: "<BQHHH", 4: "<BQHHHHH"}
+ACTIONS = (
+    LEFT,
+    RIGHT,
+    ROTATE,
+    SOFT_DROP_START,
+    SOFT_DROP_STOP,
+    HARD_DROP,
+    DRAG,
+    LEFT_PRESS,
+    LEFT_RELEASE,
+    RIGHT_PRESS,
+    RIGHT_RELEASE,
+    UNDO,
+)
+CODES = {action: code for code, action in enumerate(ACTIONS)}
+END = 0x7F
+
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def zigzag(value):
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def unzigzag(value):
+    return value // 2 if value % 2 == 0 else -(value + 1) // 2
+
+
+class Replay:
+    def __init__(self, seed, events=None, end_ms=0, history=0, width=COLS, height=ROWS, das=DAS, arr=ARR):
+        self.seed = seed
+        self.events = events if events is not None else []
+        self.end_ms = end_ms
+        self.history = history
+        self.width = width
+        self.height = height
+        self.das = das
+        self.arr = arr
+
+    def to_bytes(self):
+        out = bytearray(MAGIC)
+        out += struct.pack(
+            HEADERS[VERSION],
+            VERSION,
+            self.seed,
+            self.history,
+            self.width,
+            self.height,
+            round(self.das * 1000),
+            round(self.arr * 1000),
+        )
+        last = 0
+        for ms, action, arg in self.events:
+            write_varint(out, ms - last)
+            out.append(CODES[action])
+            if action == DRAG:
+                write_varint(out, zigzag(arg))
+            last = ms
+        write_varint(out, max(0, self.end_ms - last))
+        out.append(END)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if data[:4] != MAGIC:
+            raise ValueError("Not a Tetris replay")
+        version = data[4]
+        if version not in HEADERS:
+            raise ValueError(f"Unsupported replay version {version}")
+        header = struct.unpack_from(HEADERS[version], data, 4)
+        seed = header[1]
+        history = header[2] if version >= 2 else 0
+        width, height = header[3:5] if version >= 3 else (COLS, ROWS)
+        das, arr = (header[5] / 1000, header[6] / 1000) if version >= 4 else (DAS, ARR)
+        pos = 4 + struct.calcsize(HEADERS[version])
+        events = []
+        ms = 0
+        while True:
+            delta, pos = read_varint(data, pos)
+            ms += delta
+            code = data[pos]
+            pos += 1
+            if code == END:
+                return cls(seed, events, ms, history, width, height, das, arr)
+            action = ACTIONS[code]
+            arg = None
+            if action == DRAG:
+                arg, pos = read_varint(data, pos)
+                arg = unzigzag(arg)
+            events.append((ms, action, arg))
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+class Recorder:
+    def __init__(self, seed, history=0, width=COLS, height=ROWS, das=DAS, arr=ARR):
+        self.replay = Replay(seed, history=history, width=width, height=height, das=das, arr=arr)
+        self.finished = False
+
+    def record(self, now, action, arg=None):
+        if self.finished:
+            return
+        self.replay.events.append((round(now * 1000), action, arg))
+
+    def finish(self, now):
+        self.replay.end_ms = round(now * 1000)
+        self.finished = True
+        return self.replay
+
+
+class ReplayPlayer:
+    def __init__(self, replay):
+        self.replay = replay
+        self.index = 0
+
+    @property
+    def done(self):
+        return self.index >= len(self.replay.events)
+
+    def next_time(self):
+        if self.done:
+            return None
+        return self.replay.events[self.index][0] / 1000
+
+    def apply_due(self, state, now):
+        events = self.replay.events
+        while self.index < len(events) and not state.game_over:
+            ms, action, arg = events[self.index]
+            when = ms / 1000
+            if when > now:
+                break
+            state.advance(when)
+            state.apply_input(action, arg)
+            self.index += 1
+
+
+def play_headless(replay):
+    state = GameState(
+        seed=replay.seed,
+        history=replay.history,
+        width=replay.width,
+        height=replay.height,
+        das=replay.das,
+        arr=replay.arr,
+    )
+    player = ReplayPlayer(replay)
+    player.apply_due(state, replay.end_ms / 1000)
+    state.advance(replay.end_ms / 1000)
+    return state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play back a recorded Tetris game.")
+    parser.add_argument("path", help="replay file to play")
+    parser.add_argument("--headless", action="store_true", help="simulate as fast as possible without a window")
+    args = parser.parse_args(argv)
+
+    replay = Replay.load(args.path)
+    if args.headless:
+        start = time.perf_counter()
+        state = play_headless(replay)
+        elapsed = time.perf_counter() - start
+        print(
+            f"seed {replay.seed}  inputs {len(replay.events)}  score {state.score}  lines {state.lines}  "
+            f"level {state.level}  pieces {state.pieces}  {elapsed * 1000:.1f} ms"
+        )
+        return
+
+    import tetris
+
+    tetris.main(replay=replay)
+
+
+if __name__ == "__main__":
+    main()
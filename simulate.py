@@ -0,0 +1,163 @@
+﻿import argparse
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import time
+
+from autoplay import Autoplayer, play
+from engine import HARD_DROP, LEFT, RIGHT, ROTATE, GameState
+
+FIELDS = ("seed", "score", "lines", "level", "pieces", "seconds")
+
+
+def random_player(state, seed, max_pieces):
+    rng = random.Random(seed + 0x9E3779B9)
+    actions = (LEFT, RIGHT, ROTATE)
+    while not state.game_over and (max_pieces is None or state.pieces < max_pieces):
+        for _ in range(rng.randint(0, 4)):
+            state.apply_input(rng.choice(actions))
+        state.apply_input(HARD_DROP)
+
+
+def bot_player(state, seed, max_pieces, lookahead=True):
+    play(state, Autoplayer(lookahead=lookahead), max_pieces)
+
+
+def greedy_player(state, seed, max_pieces):
+    bot_player(state, seed, max_pieces, lookahead=False)
+
+
+PLAYERS = {
+    "random": random_player,
+    "bot": bot_player,
+    "greedy": greedy_player,
+}
+
+
+def play_game(job):
+    seed, player, max_pieces = job
+    start = time.perf_counter()
+    state = GameState(seed=seed)
+    PLAYERS[player](state, seed, max_pieces)
+    return {
+        "seed": seed,
+        "score": state.score,
+        "lines": state.lines,
+        "level": state.level,
+        "pieces": state.pieces,
+        "seconds": round(time.perf_counter() - start, 6),
+    }
+
+
+def run(games, seed, player, max_pieces, jobs):
+    work = [(seed + i, player, max_pieces) for i in range(games)]
+    if jobs <= 1:
+        return [play_game(job) for job in work]
+    chunksize = max(1, games // (jobs * 8))
+    with multiprocessing.Pool(jobs) as pool:
+        results = list(pool.imap_unordered(play_game, work, chunksize))
+    results.sort(key=lambda entry: entry["seed"])
+    return results
+
+
+def describe(values):
+    values = sorted(values)
+    count = len(values)
+    return {
+        "mean": round(sum(values) / count, 3),
+        "min": values[0],
+        "p50": values[count // 2],
+        "p95": values[min(count - 1, int(count * 0.95))],
+        "max": values[-1],
+    }
+
+
+def summarize(results, elapsed):
+    pieces = sum(entry["pieces"] for entry in results)
+    return {
+        "games": len(results),
+        "pieces": pieces,
+        "wall_seconds": round(elapsed, 3),
+        "games_per_sec": round(len(results) / elapsed, 2),
+        "pieces_per_sec": round(pieces / elapsed, 1),
+        "score": describe([entry["score"] for entry in results]),
+        "lines": describe([entry["lines"] for entry in results]),
+        "level": describe([entry["level"] for entry in results]),
+        "pieces_per_game": describe([entry["pieces"] for entry in results]),
+    }
+
+
+def write_json(path, meta, summary, results):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "summary": summary, "games": results}, f, indent=2)
+
+
+def summary_path(path):
+    return os.path.splitext(path)[0] + ".summary.csv"
+
+
+def write_csv(path, summary, results):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+    with open(summary_path(path), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(("stat", "value"))
+        for name, value in summary.items():
+            if isinstance(value, dict):
+                writer.writerows((f"{name}_{key}", stat) for key, stat in value.items())
+            else:
+                writer.writerow((name, value))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate seeded Tetris games without a window.")
+    parser.add_argument("-n", "--games", type=int, default=100, help="number of games to play")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="seed of the first game; game i uses seed + i")
+    parser.add_argument("-p", "--player", choices=sorted(PLAYERS), default="random", help="who plays the games")
+    parser.add_argument("-m", "--max-pieces", type=int, default=1000, help="stop a game after this many pieces (0 = never)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("-o", "--output", help="write per-game results and the summary to a .json or .csv file")
+    parser.add_argument("-f", "--format", choices=("json", "csv"), help="output format (default: from the file name)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    results = run(args.games, args.seed, args.player, args.max_pieces or None, args.jobs)
+    elapsed = time.perf_counter() - start
+    summary = summarize(results, elapsed)
+
+    if args.output:
+        fmt = args.format or ("csv" if args.output.endswith(".csv") else "json")
+        if fmt == "csv":
+            write_csv(args.output, summary, results)
+        else:
+            meta = {
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "player": args.player,
+                "seed": args.seed,
+                "max_pieces": args.max_pieces,
+                "jobs": args.jobs,
+            }
+            write_json(args.output, meta, summary, results)
+
+    print(
+        f"{summary['games']} games  {summary['pieces']} pieces  {summary['wall_seconds']:.2f} s  "
+        f"{summary['games_per_sec']:.1f} games/s  {summary['pieces_per_sec']:.0f} pieces/s"
+    )
+    for name in ("score", "lines", "level", "pieces_per_game"):
+        stats = summary[name]
+        print(
+            f"{name:16} mean {stats['mean']:10.1f}  p50 {stats['p50']:8}  p95 {stats['p95']:8}  "
+            f"min {stats['min']:8}  max {stats['max']:8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,445 @@
+﻿import argparse
+import asyncio
+import os
+import socket
+import stat
+import threading
+import time
+import tkinter as tk
+import zlib
+from collections import namedtuple
+
+from engine import COLORS, PALETTE, ROTATIONS
+from replay import read_varint, unzigzag, write_varint, zigzag
+from tetris import BG_COLOR, BOARD_COLOR, BOARD_H, CELL, GRID_COLOR, MARGIN, MAX_BOARD_W, TEXT_COLOR
+
+DEFAULT_ADDRESS = "127.0.0.1:7777"
+KEYFRAME = 1
+DELTA = 2
+CELLS = 1
+PIECE = 2
+STATS = 4
+
+Frame = namedtuple("Frame", "seq width height cells piece stats")
+
+
+def parse_address(text):
+    if text.startswith("unix:"):
+        return socket.AF_UNIX, text[5:]
+    host, _, port = text.rpartition(":")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+
+def write_values(out, values):
+    for value in values:
+        write_varint(out, zigzag(value))
+
+
+def read_values(data, pos, count):
+    values = []
+    for _ in range(count):
+        value, pos = read_varint(data, pos)
+        values.append(unzigzag(value))
+    return tuple(values), pos
+
+
+def message(payload):
+    out = bytearray()
+    write_varint(out, len(payload))
+    out += payload
+    return bytes(out)
+
+
+def encode_keyframe(frame):
+    out = bytearray([KEYFRAME])
+    write_varint(out, frame.seq)
+    write_varint(out, frame.width)
+    write_varint(out, frame.height)
+    cells = zlib.compress(frame.cells)
+    write_varint(out, len(cells))
+    out += cells
+    write_values(out, frame.piece)
+    write_values(out, frame.stats)
+    return message(out)
+
+
+def encode_delta(old, new):
+    flags = 0
+    body = bytearray()
+    if new.cells != old.cells:
+        flags |= CELLS
+        changes = bytearray()
+        count = 0
+        last = 0
+        width = new.width
+        before = old.cells
+        after = new.cells
+        for start in range(0, len(after), width):
+            end = start + width
+            if before[start:end] == after[start:end]:
+                continue
+            for i in range(start, end):
+                if before[i] != after[i]:
+                    write_varint(changes, i - last)
+                    changes.append(after[i])
+                    last = i
+                    count += 1
+        write_varint(body, count)
+        body += changes
+    if new.piece != old.piece:
+        flags |= PIECE
+        write_values(body, new.piece)
+    if new.stats != old.stats:
+        flags |= STATS
+        write_values(body, new.stats)
+    out = bytearray([DELTA])
+    write_varint(out, new.seq)
+    out.append(flags)
+    out += body
+    return message(out)
+
+
+class StreamEncoder:
+    def __init__(self):
+        self.seq = 0
+        self.latest = None
+        self.version = None
+
+    def update(self, state):
+        latest = self.latest
+        if latest and state.board_version == self.version:
+            cells = latest.cells
+        else:
+            cells = state.encode_cells()
+            self.version = state.board_version
+        piece = state.current.key() + (state.next_piece.kind,)
+        stats = (state.score, state.lines, state.level, int(state.game_over))
+        if latest and piece == latest.piece and stats == latest.stats and cells == latest.cells:
+            return None
+        self.seq += 1
+        frame = Frame(self.seq, state.width, state.height, cells, piece, stats)
+        self.latest = frame
+        if latest is None or (latest.width, latest.height) != (frame.width, frame.height):
+            return None
+        return encode_delta(latest, frame)
+
+
+class SpectatorState:
+    def __init__(self):
+        self.seq = None
+        self.width = 0
+        self.height = 0
+        self.cells = bytearray()
+        self.piece = None
+        self.stats = (0, 0, 1, 0)
+        self.keyframes = 0
+        self.deltas = 0
+
+    @property
+    def synced(self):
+        return self.seq is not None
+
+    def apply(self, payload):
+        kind = payload[0]
+        seq, pos = read_varint(payload, 1)
+        if kind == KEYFRAME:
+            self.width, pos = read_varint(payload, pos)
+            self.height, pos = read_varint(payload, pos)
+            size, pos = read_varint(payload, pos)
+            self.cells = bytearray(zlib.decompress(payload[pos : pos + size]))
+            self.piece, pos = read_values(payload, pos + size, 5)
+            self.stats, pos = read_values(payload, pos, 4)
+            self.seq = seq
+            self.keyframes += 1
+            return True
+        if kind != DELTA or self.seq is None or seq <= self.seq:
+            return False
+        if seq != self.seq + 1:
+            self.seq = None
+            return False
+        flags = payload[pos]
+        pos += 1
+        if flags & CELLS:
+            count, pos = read_varint(payload, pos)
+            index = 0
+            cells = self.cells
+            for _ in range(count):
+                step, pos = read_varint(payload, pos)
+                index += step
+                cells[index] = payload[pos]
+                pos += 1
+        if flags & PIECE:
+            self.piece, pos = read_values(payload, pos, 5)
+        if flags & STATS:
+            self.stats, pos = read_values(payload, pos, 4)
+        self.seq = seq
+        self.deltas += 1
+        return True
+
+    def colors(self):
+        colors = [PALETTE[value] for value in self.cells]
+        if self.piece and not self.stats[3]:
+            kind, rotation, x, y, _next_kind = self.piece
+            width = self.width
+            for c, r in ROTATIONS[kind][rotation].cells:
+                if 0 <= y + r < self.height:
+                    colors[(y + r) * width + x + c] = COLORS[kind]
+        return colors
+
+
+class Client:
+    def __init__(self, writer):
+        self.writer = writer
+        self.synced = False
+
+
+class Publisher:
+    def __init__(self, address=DEFAULT_ADDRESS, keyframe_interval=2.0, max_buffer=64 * 1024):
+        self.family, self.address = parse_address(address)
+        self.keyframe_interval = keyframe_interval
+        self.max_buffer = max_buffer
+        self.encoder = StreamEncoder()
+        self.clients = set()
+        self.loop = None
+        self.thread = None
+        self.sock = None
+        self.sent = 0
+
+    def start(self):
+        if self.family == socket.AF_UNIX:
+            try:
+                if stat.S_ISSOCK(os.stat(self.address).st_mode):
+                    os.unlink(self.address)
+            except OSError:
+                pass
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.bind(self.address)
+            self.sock.listen()
+        else:
+            self.sock = socket.create_server(self.address)
+        self.sock.setblocking(False)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def run(self):
+        loop = self.loop
+        asyncio.set_event_loop(loop)
+        if self.family == socket.AF_UNIX:
+            server = loop.run_until_complete(asyncio.start_unix_server(self.handle_client, sock=self.sock))
+        else:
+            server = loop.run_until_complete(asyncio.start_server(self.handle_client, sock=self.sock))
+        ticker = loop.create_task(self.send_keyframes())
+        loop.run_forever()
+        ticker.cancel()
+        server.close()
+        for client in self.clients:
+            client.writer.close()
+        loop.run_until_complete(asyncio.sleep(0))
+        loop.close()
+
+    async def handle_client(self, reader, writer):
+        if self.family != socket.AF_UNIX:
+            writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        client = Client(writer)
+        self.clients.add(client)
+        self.sync(client)
+        try:
+            await reader.read()
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.discard(client)
+            writer.close()
+
+    async def send_keyframes(self):
+        while True:
+            await asyncio.sleep(self.keyframe_interval)
+            frame = self.encoder.latest
+            if frame is None:
+                continue
+            data = encode_keyframe(frame)
+            for client in list(self.clients):
+                client.synced = self.send(client, data)
+
+    def sync(self, client):
+        frame = self.encoder.latest
+        if frame is not None:
+            client.synced = self.send(client, encode_keyframe(frame))
+
+    def send(self, client, data):
+        if client.writer.transport.get_write_buffer_size() > self.max_buffer:
+            return False
+        client.writer.write(data)
+        self.sent += len(data)
+        return True
+
+    def broadcast(self, data):
+        for client in list(self.clients):
+            if client.synced:
+                client.synced = self.send(client, data)
+            else:
+                self.sync(client)
+
+    def publish(self, state):
+        data = self.encoder.update(state)
+        if data and self.clients:
+            self.loop.call_soon_threadsafe(self.broadcast, data)
+
+    def close(self):
+        if self.loop is None:
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(1)
+        self.loop = None
+        if self.family == socket.AF_UNIX:
+            try:
+                os.unlink(self.address)
+            except OSError:
+                pass
+
+
+async def connect(address):
+    family, address = parse_address(address)
+    if family == socket.AF_UNIX:
+        return await asyncio.open_unix_connection(address)
+    return await asyncio.open_connection(*address)
+
+
+async def read_message(reader):
+    length = 0
+    shift = 0
+    while True:
+        byte = (await reader.readexactly(1))[0]
+        length |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            break
+        shift += 7
+    return await reader.readexactly(length)
+
+
+async def watch(address, view, on_update):
+    reader, writer = await connect(address)
+    try:
+        while True:
+            if view.apply(await read_message(reader)):
+                on_update(view)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+class Viewer:
+    def __init__(self, root, address):
+        self.root = root
+        self.open = True
+        self.dirty = False
+        self.items = None
+        self.size = None
+        self.root.title(f"Tetris spectator - {address}")
+        self.root.resizable(False, False)
+        self.canvas = tk.Canvas(root, width=320, height=120, bg=BG_COLOR, highlightthickness=0)
+        self.canvas.pack()
+        self.text = self.canvas.create_text(
+            MARGIN,
+            MARGIN,
+            anchor="nw",
+            fill=TEXT_COLOR,
+            font=("Segoe UI", 10),
+            text=f"Waiting for {address}",
+        )
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+        self.root.bind("<Escape>", lambda e: self.close())
+
+    def close(self):
+        self.open = False
+
+    def update(self, view):
+        self.dirty = True
+
+    def build(self, view):
+        cell = max(2, min(CELL, MAX_BOARD_W // view.width, BOARD_H // view.height))
+        top = MARGIN + 24
+        self.canvas.delete("board")
+        self.canvas.configure(width=view.width * cell + MARGIN * 2, height=view.height * cell + top + MARGIN)
+        self.items = [
+            self.canvas.create_rectangle(
+                MARGIN + c * cell,
+                top + r * cell,
+                MARGIN + (c + 1) * cell - 1,
+                top + (r + 1) * cell - 1,
+                fill=BOARD_COLOR,
+                outline=GRID_COLOR if cell > 4 else "",
+                tags="board",
+            )
+            for r in range(view.height)
+            for c in range(view.width)
+        ]
+        self.shown = [None] * len(self.items)
+        self.size = (view.width, view.height)
+
+    def render(self, view):
+        self.dirty = False
+        if not view.synced:
+            return
+        if self.size != (view.width, view.height):
+            self.build(view)
+        shown = self.shown
+        itemconfigure = self.canvas.itemconfigure
+        for i, color in enumerate(view.colors()):
+            if color != shown[i]:
+                shown[i] = color
+                itemconfigure(self.items[i], fill=color or BOARD_COLOR)
+        score, lines, level, game_over = view.stats
+        status = "   GAME OVER" if game_over else ""
+        itemconfigure(self.text, text=f"Score {score:,}   Lines {lines}   Level {level}{status}")
+
+
+async def run_viewer(address, fps=60):
+    root = tk.Tk()
+    viewer = Viewer(root, address)
+    view = SpectatorState()
+    task = asyncio.ensure_future(watch(address, view, viewer.update))
+    try:
+        while viewer.open:
+            if viewer.dirty:
+                viewer.render(view)
+            if task.done():
+                viewer.canvas.itemconfigure(viewer.text, text=f"Disconnected from {address}")
+            root.update()
+            await asyncio.sleep(1 / fps)
+    finally:
+        task.cancel()
+        root.destroy()
+
+
+async def run_headless(address, seconds):
+    view = SpectatorState()
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(watch(address, view, lambda view: None), seconds)
+    except asyncio.TimeoutError:
+        pass
+    elapsed = time.perf_counter() - start
+    score, lines, level, game_over = view.stats
+    print(
+        f"seq {view.seq}  keyframes {view.keyframes}  deltas {view.deltas}  score {score}  lines {lines}  "
+        f"level {level}  {elapsed:.1f} s"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Watch a running Tetris game.")
+    parser.add_argument("address", nargs="?", default=DEFAULT_ADDRESS, help="host:port or unix:/path of the game")
+    parser.add_argument("--headless", type=float, metavar="SECONDS", help="follow the stream without a window")
+    args = parser.parse_args(argv)
+    if args.headless:
+        asyncio.run(run_headless(args.address, args.headless))
+    else:
+        asyncio.run(run_viewer(args.address))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+﻿import os
+import queue
+import sqlite3
+import threading
+import time
+
+FIELDS = (
+    "ended",
+    "score",
+    "lines",
+    "level",
+    "duration",
+    "pieces",
+    "frame_mean_ms",
+    "frame_p99_ms",
+    "seed",
+    "board",
+    "finished",
+    "autoplay",
+)
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS games (
+        id INTEGER PRIMARY KEY,
+        ended REAL NOT NULL,
+        score INTEGER NOT NULL,
+        lines INTEGER NOT NULL,
+        level INTEGER NOT NULL,
+        duration REAL NOT NULL,
+        pieces INTEGER NOT NULL,
+        frame_mean_ms REAL,
+        frame_p99_ms REAL,
+        seed INTEGER,
+        board TEXT,
+        finished INTEGER NOT NULL DEFAULT 1,
+        autoplay INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS games_by_score ON games (autoplay, score DESC, ended)",
+    "CREATE INDEX IF NOT EXISTS games_by_ended ON games (ended DESC)",
+)
+INSERT = f"INSERT INTO games ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})"
+COLUMNS = "id, " + ", ".join(FIELDS)
+STOP = object()
+
+
+def default_path():
+    path = os.environ.get("TETRIS_STATS")
+    if path:
+        return path
+    if os.name == "nt":
+        base = os.environ.get("APPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, "neon-tetris", "stats.sqlite3")
+
+
+def connect(path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=5)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    with conn:
+        for statement in SCHEMA:
+            conn.execute(statement)
+    return conn
+
+
+class StatsStore:
+    def __init__(self, path=None, batch_size=512):
+        self.path = path or default_path()
+        self.batch_size = batch_size
+        self.queue = queue.SimpleQueue()
+        self.thread = None
+        self.reader = None
+        self.error = None
+        self.written = 0
+        self.commits = 0
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="stats-writer", daemon=True)
+            self.thread.start()
+
+    def record(self, **game):
+        if self.error:
+            return
+        game.setdefault("ended", time.time())
+        game.setdefault("finished", 1)
+        game.setdefault("autoplay", 0)
+        self.queue.put(tuple(game.get(field) for field in FIELDS))
+        self.start()
+
+    def run(self):
+        try:
+            conn = connect(self.path)
+        except (OSError, sqlite3.Error) as exc:
+            self.error = exc
+            print(f"Failed to open stats: {exc}")
+            return
+        try:
+            item = None
+            while item is not STOP:
+                batch = []
+                item = self.queue.get()
+                while item is not STOP:
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                if batch:
+                    self.write(conn, batch)
+        finally:
+            conn.close()
+
+    def write(self, conn, batch):
+        try:
+            with conn:
+                conn.executemany(INSERT, batch)
+        except sqlite3.Error as exc:
+            if len(batch) == 1:
+                print(f"Failed to write stats: {exc}")
+                return
+            for item in batch:
+                self.write(conn, [item])
+            return
+        self.written += len(batch)
+        self.commits += 1
+
+    def close(self, timeout=5.0):
+        if self.thread is not None:
+            self.queue.put(STOP)
+            self.thread.join(timeout)
+            self.thread = None
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+    def query(self, sql, params=()):
+        if self.reader is None:
+            self.reader = connect(self.path)
+        return [dict(row) for row in self.reader.execute(sql, params)]
+
+    def high_scores(self, limit=10, autoplay=False):
+        return self.query(
+            f"SELECT {COLUMNS} FROM games WHERE autoplay = ? ORDER BY score DESC, ended LIMIT ?",
+            (int(autoplay), limit),
+        )
+
+    def history(self, limit=20, before=None):
+        if before is None:
+            return self.query(f"SELECT {COLUMNS} FROM games ORDER BY ended DESC LIMIT ?", (limit,))
+        return self.query(
+            f"SELECT {COLUMNS} FROM games WHERE ended < ? ORDER BY ended DESC LIMIT ?",
+            (before, limit),
+        )
+
+    def count(self):
+        return self.query("SELECT COUNT(*) AS games FROM games")[0]["games"]
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}:{seconds:02d}"
+
+
+def format_game(game, rank=None):
+    ended = time.strftime("%Y-%m-%d %H:%M", time.localtime(game["ended"]))
+    prefix = f"{rank:>3}. " if rank is not None else ""
+    line = (
+        f"{prefix}{game['score']:>8}  lines {game['lines']:>4}  level {game['level']:>2}"
+        f"  {format_duration(game['duration']):>6}  {ended}"
+    )
+    if not game["finished"]:
+        line += "  (quit)"
+    return line
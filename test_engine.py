@@ -0,0 +1,339 @@
+﻿import random
+import unittest
+
+from engine import (
+    ARR,
+    DAS,
+    DRAG,
+    HARD_DROP,
+    LEFT,
+    LEFT_PRESS,
+    LEFT_RELEASE,
+    RIGHT,
+    RIGHT_PRESS,
+    RIGHT_RELEASE,
+    ROTATE,
+    SOFT_DROP_START,
+    SOFT_DROP_STOP,
+    UNDO,
+    GameState,
+    Piece,
+)
+from replay import Recorder, Replay, play_headless
+
+ACTIONS = (LEFT, RIGHT, ROTATE, HARD_DROP, SOFT_DROP_START, SOFT_DROP_STOP, LEFT_PRESS, LEFT_RELEASE, RIGHT_PRESS)
+
+
+def fill_row(state, row, hole=None):
+    for c in range(state.width):
+        if c != hole:
+            state.grid[row][c] = "#ffffff"
+            state.rows[row] |= 1 << c
+    state.rebuild_index()
+
+
+def naive_fits(state, kind, rotation, x, y):
+    for c, r in Piece(kind, rotation, x, y).cells():
+        if c < 0 or c >= state.width or r >= state.height:
+            return False
+        if r >= 0 and state.grid[r][c] is not None:
+            return False
+    return True
+
+
+def naive_ghost(state):
+    piece = state.current
+    y = piece.y
+    while naive_fits(state, piece.kind, piece.rotation, piece.x, y + 1):
+        y += 1
+    return y
+
+
+def check_index(test, state):
+    for r, row in enumerate(state.grid):
+        test.assertEqual(state.rows[r], sum(1 << c for c, color in enumerate(row) if color))
+    for c in range(state.width):
+        top = next((r for r in range(state.height) if state.grid[r][c] is not None), state.height)
+        test.assertEqual(state.tops[c], top)
+    if not state.game_over:
+        test.assertEqual(state.ghost_y(), naive_ghost(state))
+
+
+class CollisionTest(unittest.TestCase):
+    def test_walls_and_floor(self):
+        state = GameState(seed=1)
+        piece = state.current
+        while state.move(-1, 0):
+            pass
+        self.assertTrue(state.collides(piece.kind, piece.rotation, piece.x - 1, piece.y))
+        while state.move(1, 0):
+            pass
+        self.assertTrue(state.collides(piece.kind, piece.rotation, piece.x + 1, piece.y))
+        while state.move(0, 1):
+            pass
+        self.assertTrue(state.collides(piece.kind, piece.rotation, piece.x, piece.y + 1))
+        self.assertEqual(piece.y + piece.state.bottom, state.height - 1)
+
+    def test_occupied_cells(self):
+        state = GameState(seed=1)
+        fill_row(state, state.height - 1, hole=0)
+        piece = state.current
+        self.assertEqual(state.ghost_y() + piece.state.bottom, state.height - 2)
+        self.assertFalse(state.collides(piece.kind, piece.rotation, piece.x, -2))
+
+    def test_cells_above_board_do_not_collide(self):
+        state = GameState(seed=1)
+        piece = state.current
+        self.assertFalse(state.collides(piece.kind, piece.rotation, piece.x, piece.y))
+        self.assertLess(piece.y + piece.state.top, 0)
+
+
+class ClearTest(unittest.TestCase):
+    def test_single_clear(self):
+        state = GameState(seed=2, events=True)
+        bottom = state.height - 1
+        fill_row(state, bottom, hole=0)
+        state.grid[bottom - 1][3] = "#ffffff"
+        state.rows[bottom - 1] |= 1 << 3
+        state.rebuild_index()
+        self.assertEqual(state.clear_lines(), [])
+        state.grid[bottom][0] = "#ffffff"
+        state.rows[bottom] |= 1
+        self.assertEqual(state.clear_lines(), [bottom])
+        self.assertEqual(state.lines, 1)
+        self.assertEqual(state.score, 100)
+        self.assertEqual(state.rows[bottom], 1 << 3)
+        self.assertEqual(state.rows[0], 0)
+        self.assertIn(("clear", [bottom]), state.drain_events())
+        check_index(self, state)
+
+    def test_tetris_scores_and_levels(self):
+        state = GameState(seed=2)
+        for row in range(state.height - 4, state.height):
+            fill_row(state, row)
+        self.assertEqual(len(state.clear_lines()), 4)
+        self.assertEqual(state.score, 800)
+        self.assertEqual(state.tops, [state.height] * state.width)
+        state.lines = 9
+        fill_row(state, state.height - 1)
+        state.clear_lines()
+        self.assertEqual(state.level, 2)
+        self.assertLess(state.drop_interval, state.base_interval)
+
+    def test_hard_drop_clears_and_spawns(self):
+        state = GameState(seed=3)
+        while state.current.kind != 0:
+            state.reset(state.rng.getrandbits(32))
+        bottom = state.height - 1
+        fill_row(state, bottom)
+        state.grid[bottom][3:7] = [None] * 4
+        state.rows[bottom] &= ~(0b1111 << 3)
+        state.rebuild_index()
+        state.current.x = 3 - state.current.state.left
+        state.hard_drop()
+        self.assertEqual(state.lines, 1)
+        self.assertEqual(state.pieces, 1)
+        self.assertEqual(state.rows, [0] * state.height)
+        check_index(self, state)
+
+
+class IndexTest(unittest.TestCase):
+    def test_random_games_match_naive_scan(self):
+        for seed in range(20):
+            rng = random.Random(seed)
+            width = rng.choice((4, 10, 13))
+            state = GameState(seed=seed, width=width, height=rng.choice((8, 20)))
+            for _ in range(400):
+                roll = rng.random()
+                if roll < 0.05:
+                    state.add_garbage(rng.randint(1, 3), rng.randrange(width))
+                elif roll < 0.1:
+                    state.drag_to(rng.randrange(width))
+                else:
+                    state.apply_input(rng.choice(ACTIONS))
+                state.step()
+                check_index(self, state)
+                if state.game_over:
+                    break
+
+    def test_garbage_raises_stack(self):
+        state = GameState(seed=4)
+        state.add_garbage(2, 5)
+        state.hard_drop()
+        self.assertEqual(state.rows[-1], state.full_row & ~(1 << 5))
+        self.assertEqual(state.rows[-2], state.full_row & ~(1 << 5))
+        check_index(self, state)
+
+    def test_garbage_overflow_ends_game(self):
+        state = GameState(seed=4, height=6)
+        state.add_garbage(6, 0)
+        state.hard_drop()
+        self.assertTrue(state.game_over)
+
+
+class GhostTest(unittest.TestCase):
+    def test_ghost_follows_moves_and_board(self):
+        state = GameState(seed=5)
+        self.assertEqual(state.ghost_y(), naive_ghost(state))
+        state.move(-2, 0)
+        self.assertEqual(state.ghost_y(), naive_ghost(state))
+        fill_row(state, state.height - 1, hole=9)
+        self.assertEqual(state.ghost_y(), naive_ghost(state))
+
+    def test_ghost_under_overhang(self):
+        state = GameState(seed=5)
+        piece = state.current
+        cells = [c for c, _r in piece.cells()]
+        for c in cells:
+            state.grid[state.height - 5][c] = "#ffffff"
+            state.rows[state.height - 5] |= 1 << c
+        state.rebuild_index()
+        piece.y = state.height - 4 - piece.state.top
+        self.assertEqual(state.ghost_y(), naive_ghost(state))
+        self.assertEqual(state.ghost_y() + piece.state.bottom, state.height - 1)
+
+
+class InputQueueTest(unittest.TestCase):
+    def test_drags_coalesce(self):
+        state = GameState(seed=6)
+        state.queue_input(0.1, DRAG, 2)
+        state.queue_input(0.12, DRAG, 7)
+        self.assertEqual(list(state.inputs), [(0.12, DRAG, 7)])
+
+    def test_release_and_repress_cancel(self):
+        state = GameState(seed=6)
+        state.queue_input(0.1, LEFT_PRESS)
+        state.queue_input(0.2, LEFT_RELEASE)
+        state.queue_input(0.2, LEFT_PRESS)
+        self.assertEqual(list(state.inputs), [(0.1, LEFT_PRESS, None)])
+
+    def test_other_inputs_are_kept(self):
+        state = GameState(seed=6)
+        state.queue_input(0.1, ROTATE)
+        state.queue_input(0.1, ROTATE)
+        state.queue_input(0.2, DRAG, 3)
+        state.queue_input(0.3, HARD_DROP)
+        state.queue_input(0.4, DRAG, 4)
+        self.assertEqual(len(state.inputs), 5)
+
+    def test_inputs_apply_in_time_order_with_gravity(self):
+        state = GameState(seed=6)
+        x = state.current.x
+        y = state.current.y
+        state.queue_input(0.3, LEFT)
+        state.queue_input(0.9, LEFT)
+        state.advance(0.5)
+        self.assertEqual(state.current.x, x - 1)
+        self.assertEqual(state.current.y, y)
+        state.advance(1.0)
+        self.assertEqual(state.current.x, x - 2)
+        self.assertEqual(state.current.y, y + 1)
+        self.assertFalse(state.inputs)
+
+    def test_das_then_arr(self):
+        state = GameState(seed=6)
+        state.current.x = -state.current.state.left
+        x = state.current.x
+        state.apply_input(RIGHT_PRESS)
+        self.assertEqual(state.current.x, x + 1)
+        state.advance(state.das - 0.001)
+        self.assertEqual(state.current.x, x + 1)
+        state.advance(state.das + state.arr + 0.001)
+        self.assertEqual(state.current.x, x + 3)
+        state.apply_input(RIGHT_RELEASE)
+        self.assertIsNone(state.shift_next)
+
+    def test_configurable_das_and_arr(self):
+        state = GameState(seed=6, das=0.05, arr=0.1)
+        state.current.x = -state.current.state.left
+        x = state.current.x
+        state.apply_input(RIGHT_PRESS)
+        state.advance(0.051)
+        self.assertEqual(state.current.x, x + 2)
+        state.advance(0.149)
+        self.assertEqual(state.current.x, x + 2)
+        state.advance(0.151)
+        self.assertEqual(state.current.x, x + 3)
+        with self.assertRaises(ValueError):
+            GameState(arr=0)
+
+
+class UndoTest(unittest.TestCase):
+    def test_snapshot_round_trip(self):
+        state = GameState(seed=7)
+        rng = random.Random(7)
+        for _ in range(40):
+            state.apply_input(rng.choice(ACTIONS))
+            state.step()
+        snapshot = state.snapshot()
+        copy = GameState(seed=0)
+        copy.sequence[:] = state.sequence
+        copy.restore(snapshot)
+        self.assertEqual(copy.snapshot(), snapshot)
+        self.assertEqual(copy.grid, state.grid)
+        self.assertEqual(copy.next_piece.key(), state.next_piece.key())
+
+    def test_restore_keeps_wide_spawn(self):
+        state = GameState(seed=7, width=30)
+        snapshot = state.snapshot()
+        state.hard_drop()
+        state.restore(snapshot)
+        self.assertEqual(state.next_piece.key(), Piece(0).spawn(snapshot.next_kind, 30).key())
+
+    def test_undo_restores_previous_piece(self):
+        state = GameState(seed=8, history=4)
+        before = state.snapshot()
+        state.hard_drop()
+        state.hard_drop()
+        self.assertTrue(state.undo())
+        state.time = before.time
+        self.assertTrue(state.undo())
+        after = state.snapshot()
+        self.assertEqual(after.cells, before.cells)
+        self.assertEqual(after.rows, before.rows)
+        self.assertEqual(after.tops, before.tops)
+        self.assertEqual(after.piece, before.piece)
+        self.assertEqual(after.score, before.score)
+        self.assertFalse(state.undo())
+
+    def test_undo_replays_same_pieces(self):
+        state = GameState(seed=9, history=2)
+        state.hard_drop()
+        kinds = (state.current.kind, state.next_piece.kind)
+        state.hard_drop()
+        state.undo()
+        self.assertEqual((state.current.kind, state.next_piece.kind), kinds)
+
+
+class ReplayTest(unittest.TestCase):
+    def record(self, seed, history=0, width=10, height=20, das=DAS, arr=ARR):
+        rng = random.Random(seed)
+        state = GameState(seed=seed, events=True, history=history, width=width, height=height, das=das, arr=arr)
+        recorder = Recorder(seed, history, width, height, das, arr)
+        now = 0.0
+        while not state.game_over and now < 120:
+            now = round(now + rng.choice((0.016, 0.05, 0.2)), 3)
+            state.queue_input(now, rng.choice(ACTIONS + (UNDO,) if history else ACTIONS))
+            state.advance(now)
+            for event in state.drain_events():
+                if event[0] == "input":
+                    recorder.record(*event[1:])
+        return state, recorder.finish(now)
+
+    def test_replay_matches_recording(self):
+        for seed, history, width, das, arr in ((1, 0, 10, DAS, ARR), (2, 8, 10, DAS, ARR), (3, 0, 16, 0.05, 0.01)):
+            state, replay = self.record(seed, history, width, das=das, arr=arr)
+            played = play_headless(Replay.from_bytes(replay.to_bytes()))
+            self.assertEqual(played.snapshot(), state.snapshot())
+            self.assertEqual(played.grid, state.grid)
+
+    def test_round_trip_bytes(self):
+        _state, replay = self.record(4, das=0.1, arr=0.02)
+        copy = Replay.from_bytes(replay.to_bytes())
+        self.assertEqual((copy.seed, copy.end_ms, copy.width, copy.height), (4, replay.end_ms, 10, 20))
+        self.assertEqual((copy.das, copy.arr), (0.1, 0.02))
+        self.assertEqual(copy.events, replay.events)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+﻿import tkinter as tk
+import unittest
+
+from engine import HARD_DROP
+
+
+class VersusTest(unittest.TestCase):
+    def setUp(self):
+        try:
+            self.root = tk.Tk()
+        except tk.TclError as exc:
+            self.skipTest(f"no display: {exc}")
+        import multiboard
+
+        self.wall = multiboard.MultiBoard(self.root, count=2, humans=2, versus=True, seed=1)
+        self.addCleanup(self.wall.handle_close)
+
+    def drop(self, *boards):
+        wall = self.wall
+        for _ in range(100):
+            for board in boards:
+                wall.queue_input(board, HARD_DROP)
+            wall.cancel_draw()
+            wall.flush_draw()
+            if not wall.running:
+                return
+
+    def test_boards_topping_out_together_is_a_draw(self):
+        wall = self.wall
+        self.drop(*wall.boards)
+        self.assertFalse(wall.running)
+        self.assertTrue(all(board.state.game_over for board in wall.boards))
+        self.assertEqual([board.wins for board in wall.boards], [0, 0])
+        self.assertTrue(wall.canvas.itemcget(wall.status, "text").startswith("Game over"))
+
+    def test_last_board_standing_wins(self):
+        wall = self.wall
+        first, second = wall.boards
+        self.drop(first)
+        self.assertFalse(wall.running)
+        self.assertEqual((first.wins, second.wins), (0, 1))
+        pieces = second.state.pieces
+        wall.queue_input(second, HARD_DROP)
+        wall.flush_draw()
+        self.assertEqual(second.state.pieces, pieces)
+
+
+if __name__ == "__main__":
+    unittest.main()
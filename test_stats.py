@@ -0,0 +1,30 @@
+﻿import os
+import tempfile
+import unittest
+
+from stats import StatsStore
+
+
+class StatsStoreTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.store = StatsStore(os.path.join(directory, "stats.sqlite3"))
+        self.addCleanup(self.store.close)
+
+    def test_omitted_fields_use_defaults(self):
+        self.store.record(score=1, lines=0, level=1, duration=1, pieces=1)
+        self.store.close()
+        games = self.store.history()
+        self.assertEqual(len(games), 1)
+        self.assertEqual((games[0]["finished"], games[0]["autoplay"]), (1, 0))
+
+    def test_bad_game_does_not_drop_its_batch(self):
+        self.store.record(score=1, lines=0, level=1, duration=1, pieces=1)
+        self.store.record(score=2, lines=0, level=1, duration=1, pieces=None)
+        self.store.record(score=3, lines=0, level=1, duration=1, pieces=1)
+        self.store.close()
+        self.assertEqual(sorted(game["score"] for game in self.store.history()), [1, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
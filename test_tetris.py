@@ -0,0 +1,129 @@
+﻿import os
+import random
+import tempfile
+import tkinter as tk
+import unittest
+from unittest import mock
+
+from engine import HARD_DROP, LEFT, LEFT_PRESS, LEFT_RELEASE, RIGHT, ROTATE, SOFT_DROP_START, SOFT_DROP_STOP
+from replay import Replay, play_headless
+
+ACTIONS = (LEFT, RIGHT, ROTATE, ROTATE, HARD_DROP, SOFT_DROP_START, SOFT_DROP_STOP)
+
+
+def make_replay(seed):
+    rng = random.Random(seed)
+    events = [(200, LEFT_PRESS, None), (1400, LEFT_RELEASE, None)]
+    ms = 1500
+    for _ in range(150):
+        ms += rng.randrange(30, 400)
+        events.append((ms, rng.choice(ACTIONS), None))
+    return Replay(seed, events, ms + 500)
+
+
+class ViewTest(unittest.TestCase):
+    def setUp(self):
+        try:
+            self.root = tk.Tk()
+        except tk.TclError as exc:
+            self.skipTest(f"no display: {exc}")
+        self.now = 1000.0
+        patches = (
+            mock.patch("time.monotonic", lambda: self.now),
+            mock.patch.dict(os.environ, {"TETRIS_CACHE_DIR": tempfile.mkdtemp()}),
+        )
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def play(self, replay, pause_at=None):
+        import tetris
+
+        game = tetris.Tetris(self.root, replay=replay)
+        while game.running:
+            self.now += 0.005
+            if pause_at is not None and game.clock() >= pause_at:
+                pause_at = None
+                game.set_paused("unfocused", True)
+                self.now += 2.0
+                game.set_paused("unfocused", False)
+            game.tick()
+        snapshot = game.state.snapshot()
+        game.handle_close()
+        return snapshot._replace(time=None)
+
+    def test_replay_matches_headless(self):
+        replay = make_replay(11)
+        expected = play_headless(replay).snapshot()._replace(time=None)
+        self.assertEqual(self.play(replay), expected)
+
+    def test_pause_during_replay_keeps_it_in_sync(self):
+        replay = make_replay(12)
+        expected = play_headless(replay).snapshot()._replace(time=None)
+        self.assertEqual(self.play(replay, pause_at=0.25), expected)
+
+    def test_reused_window_starts_a_fresh_session(self):
+        import tetris
+
+        game = tetris.Tetris(tk.Toplevel(self.root), owns_root=False, reusable=True)
+        game.toggle_autoplay()
+        game.toggle_metrics()
+        game.handle_close()
+        game.show()
+        self.assertIsNone(game.bot)
+        self.assertIsNone(game.bot_next)
+        self.assertFalse(game.show_metrics)
+        self.assertFalse(game.assisted)
+        self.assertTrue(game.running)
+
+    def test_animation_frames_only_repaint_tween_rows(self):
+        import tetris
+
+        game = tetris.Tetris(self.root, seed=3, renderer="framebuffer")
+        self.addCleanup(game.handle_close)
+        game.queue_input(HARD_DROP)
+        game.cancel_draw()
+        game.flush_draw()
+        tween = game.animator.get("lock")
+        self.assertEqual(set(tween.rows), {r for _c, r in tween.data[1]})
+        self.now += 0.05
+        frame = game.renderer.frame
+        with mock.patch.object(game.renderer, "render") as render:
+            with mock.patch.object(frame, "draw", wraps=frame.draw) as draw:
+                game.flush_draw()
+        render.assert_not_called()
+        self.assertEqual(draw.call_args.args[3], set(tween.rows))
+
+    def test_canvas_animation_frames_only_redraw_running_effects(self):
+        import tetris
+
+        game = tetris.Tetris(self.root, seed=3)
+        self.addCleanup(game.handle_close)
+        game.queue_input(HARD_DROP)
+        game.cancel_draw()
+        game.flush_draw()
+        self.now += 0.05
+        renderer = game.renderer
+        with mock.patch.object(renderer, "render") as render:
+            with mock.patch.object(renderer, "draw_line_flash") as line_flash:
+                with mock.patch.object(renderer, "draw_lock_flash") as lock_flash:
+                    game.flush_draw()
+        render.assert_not_called()
+        line_flash.assert_not_called()
+        lock_flash.assert_called_once()
+
+    def test_draw_after_request_draw_renders(self):
+        import tetris
+
+        game = tetris.Tetris(self.root, seed=3)
+        self.addCleanup(game.handle_close)
+        game.cancel_draw()
+        game.flush_draw()
+        game.request_draw()
+        with mock.patch.object(game.renderer, "render") as render:
+            game.draw()
+        render.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,36 @@
-﻿import random
+﻿import bisect
+import json
+import math
+import os
+import random
 import time
 import tkinter as tk
+from collections import deque
+from functools import lru_cache
+
+from animation import Animator, ease_in_out, ease_out
+from autoplay import Autoplayer
+from engine import (
+    ARR,
+    COLORS,
+    COLS,
+    DAS,
+    DRAG,
+    HARD_DROP,
+    LEFT_PRESS,
+    LEFT_RELEASE,
+    RIGHT_PRESS,
+    RIGHT_RELEASE,
+    ROTATE,
+    ROTATIONS,
+    ROWS,
+    SOFT_DROP_START,
+    SOFT_DROP_STOP,
+    UNDO,
+    GameState,
+)
+from replay import Recorder, ReplayPlayer
+from stats import StatsStore
 
 try:
     from PIL import Image, ImageTk, ImageDraw, ImageFilter
@@ -11,14 +41,16 @@ except ImportError:
     ImageFilter = None
 
 CELL = 28
-COLS = 10
-ROWS = 20
+PREVIEW_CELL = 16
 MARGIN = 16
 PANEL_W = 220
 BOARD_W = COLS * CELL
 BOARD_H = ROWS * CELL
 CANVAS_W = BOARD_W + PANEL_W + MARGIN * 2
 CANVAS_H = BOARD_H + MARGIN * 2
+MAX_BOARD_W = 840
+MIN_CELL = 6
+HUD_H = 440
 
 BG_COLOR = "#0c0f14"
 BOARD_COLOR = "#121823"
@@ -27,23 +59,14 @@ TEXT_COLOR = "#e8f0ff"
 MUTED_TEXT = "#9fb0c8"
 ACCENT = "#57c7ff"
 
-SHAPES = [
-    ([[1, 1, 1, 1]], "#35c9ff"),
-    ([[1, 1], [1, 1]], "#f2d74e"),
-    ([[0, 1, 0], [1, 1, 1]], "#b76cff"),
-    ([[1, 0, 0], [1, 1, 1]], "#4e7af2"),
-    ([[0, 0, 1], [1, 1, 1]], "#f29b4e"),
-    ([[0, 1, 1], [1, 1, 0]], "#4ef27a"),
-    ([[1, 1, 0], [0, 1, 1]], "#f24e4e"),
-]
+UNDO_HISTORY = 32
+FADE_STEPS = 8
 
-LINE_SCORES = {1: 100, 2: 300, 3: 500, 4: 800}
-
-
-def rotate(shape):
-    return [list(row) for row in zip(*shape[::-1])]
+BACKGROUND_SEED = 1337
+BACKGROUND_VERSION = 2
 
 
+@lru_cache(maxsize=None)
 def shade_color(hex_color, factor):
     hex_color = hex_color.lstrip("#")
     r = int(hex_color[0:2], 16)
@@ -57,28 +80,53 @@ def shade_color(hex_color, factor):
     return f"#{r:02x}{g:02x}{b:02x}"
 
 
-def generate_background(width, height):
-    if not Image or not ImageDraw:
-        return None
+@lru_cache(maxsize=None)
+def mix_color(start, end, t):
+    a = int(start.lstrip("#"), 16)
+    b = int(end.lstrip("#"), 16)
+    channels = [round(((a >> s) & 255) + (((b >> s) & 255) - ((a >> s) & 255)) * t) for s in (16, 8, 0)]
+    return "#{:02x}{:02x}{:02x}".format(*channels)
+
+
+def cache_dir():
+    base = os.environ.get("TETRIS_CACHE_DIR")
+    if base:
+        return base
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "neon-tetris")
 
-    img = Image.new("RGB", (width, height), "#0b0f16")
-    draw = ImageDraw.Draw(img)
 
-    for y in range(height):
-        ratio = y / max(1, height - 1)
-        r = int(10 + 20 * ratio)
-        g = int(14 + 18 * ratio)
-        b = int(24 + 30 * ratio)
-        draw.line([(0, y), (width, y)], fill=(r, g, b))
-
-    rng = random.Random(1337)
-    for _ in range(240):
-        x = rng.randint(0, width - 1)
-        y = rng.randint(0, height - 1)
+def gradient_image(width, height):
+    column = Image.new("RGB", (1, height))
+    scale = max(1, height - 1)
+    column.putdata(
+        [(int(10 + 20 * y / scale), int(14 + 18 * y / scale), int(24 + 30 * y / scale)) for y in range(height)]
+    )
+    return column.resize((width, height), Image.NEAREST)
+
+
+def add_stars(img, rng, count):
+    for _ in range(count):
+        x = rng.randint(0, img.width - 1)
+        y = rng.randint(0, img.height - 1)
         c = rng.randint(160, 230)
-        draw.point((x, y), fill=(c, c, c))
+        img.putpixel((x, y), (c, c, c))
+    return img
+
+
+def generate_background(width, height, seed=BACKGROUND_SEED):
+    if not Image or not ImageDraw:
+        return None
+
+    rng = random.Random(seed)
+    img = add_stars(gradient_image(width, height), rng, 240)
 
-    overlay = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    scale = 4
+    small = ((width + scale - 1) // scale, (height + scale - 1) // scale)
+    overlay = Image.new("RGBA", small, (0, 0, 0, 0))
     odraw = ImageDraw.Draw(overlay)
     for _ in range(8):
         cx = rng.randint(-80, width - 40)
@@ -86,43 +134,1060 @@ def generate_background(width, height):
         w = rng.randint(160, 320)
         h = rng.randint(90, 200)
         color = rng.choice([(80, 160, 255, 70), (140, 80, 255, 70), (80, 255, 200, 60)])
-        odraw.ellipse([cx, cy, cx + w, cy + h], fill=color)
+        odraw.ellipse([cx / scale, cy / scale, (cx + w) / scale, (cy + h) / scale], fill=color)
 
     if ImageFilter:
-        overlay = overlay.filter(ImageFilter.GaussianBlur(18))
+        overlay = overlay.filter(ImageFilter.GaussianBlur(18 / scale))
+    overlay = overlay.resize((small[0] * scale, small[1] * scale), Image.BILINEAR).crop((0, 0, width, height))
     img = Image.alpha_composite(img.convert("RGBA"), overlay).convert("RGB")
 
-    for x in range(0, width, 56):
-        draw.line([(x, 0), (x, height)], fill=(20, 30, 45))
-    for y in range(0, height, 56):
-        draw.line([(0, y), (width, y)], fill=(20, 30, 45))
+    return img.point([v // 2 for v in range(256)] * 3)
 
-    for _ in range(6):
-        x0 = rng.randint(-60, width - 60)
-        y0 = rng.randint(0, height)
-        x1 = x0 + rng.randint(140, 320)
-        y1 = y0 + rng.randint(-80, 80)
-        color = rng.choice([(70, 200, 255), (120, 90, 255), (90, 255, 200)])
-        draw.line([(x0, y0), (x1, y1)], fill=color, width=2)
 
-    black = Image.new("RGB", img.size, (0, 0, 0))
-    img = Image.blend(img, black, 0.5)
+def load_background(width, height, seed=BACKGROUND_SEED):
+    if not Image:
+        return None
+    path = os.path.join(cache_dir(), f"background-{width}x{height}-{seed}-v{BACKGROUND_VERSION}.png")
+    try:
+        with Image.open(path) as cached:
+            if cached.size == (width, height):
+                return cached.convert("RGB")
+    except (OSError, ValueError):
+        pass
+
+    img = generate_background(width, height, seed)
+    if img:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            img.save(tmp_path, "PNG", compress_level=1)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+    return img
+
+
+def render_sprite(color, size, style):
+    last = size - 1
+    if style in ("empty", "ghost"):
+        outline = color if style == "empty" else shade_color(color, 0.35)
+        img = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+        ImageDraw.Draw(img).rectangle([0, 0, last, last], outline=outline)
+        return img
 
+    img = Image.new("RGB", (size, size), color)
+    draw = ImageDraw.Draw(img)
+    dark = shade_color(color, 0.7)
+    draw.rectangle([0, 0, last, last], outline=dark)
+    if style == "block":
+        light = shade_color(color, 1.25)
+        draw.line([(2, 2), (last - 2, 2)], fill=light)
+        draw.line([(2, 2), (2, last - 2)], fill=light)
+        draw.line([(2, last - 2), (last - 2, last - 2)], fill=dark)
+        draw.line([(last - 2, 2), (last - 2, last - 2)], fill=dark)
     return img
 
 
-class Tetris:
-    def __init__(self, root, on_close=None, owns_root=True):
+def render_tile(color, size, style):
+    if style == "block":
+        return render_sprite(color, size, "block")
+    if style == "dim":
+        return render_tile(color, size, "block" if color else "empty").point(lambda v: v * 2 // 5)
+    tile = Image.new("RGB", (size, size), BOARD_COLOR)
+    empty = render_sprite(GRID_COLOR, size, "empty")
+    tile.paste(empty, (0, 0), empty)
+    if style == "ghost":
+        ghost = render_sprite(color, size, "ghost")
+        tile.paste(ghost, (0, 0), ghost)
+    elif style == "flash":
+        draw = ImageDraw.Draw(tile)
+        last = size - 1
+        glow = color or shade_color(ACCENT, 1.4)
+        draw.line([(0, 2), (last, 2)], fill=glow, width=2)
+        draw.line([(0, last - 2), (last, last - 2)], fill=glow, width=2)
+        draw.line([(0, size // 2), (last, size // 2)], fill=shade_color(glow, 1.3), width=2)
+    return tile
+
+
+def render_sprites(colors, size=CELL, preview_size=PREVIEW_CELL):
+    if not Image or not ImageDraw:
+        return {}
+    sprites = {(GRID_COLOR, size, "empty"): render_sprite(GRID_COLOR, size, "empty")}
+    for color in colors:
+        sprites[color, size, "block"] = render_sprite(color, size, "block")
+        sprites[color, size, "ghost"] = render_sprite(color, size, "ghost")
+        sprites[color, preview_size, "preview"] = render_sprite(color, preview_size, "preview")
+    return sprites
+
+
+def load_assets():
+    return {
+        "background": load_background(CANVAS_W, CANVAS_H),
+        "sprites": render_sprites(COLORS),
+    }
+
+
+class SpriteAtlas:
+    def __init__(self, sprites=None, images=None):
+        self.images = images if images is not None else {}
+        if not ImageTk or images is not None:
+            return
+        if sprites is None:
+            sprites = render_sprites(COLORS)
+        for key, img in sprites.items():
+            self.images[key] = ImageTk.PhotoImage(img)
+
+    def get(self, color, size, style):
+        key = (color, size, style)
+        image = self.images.get(key)
+        if image is None and self.images:
+            image = self.images[key] = ImageTk.PhotoImage(render_sprite(color, size, style))
+        return image
+
+
+class Histogram:
+    edges = [0.00002 * 1.25 ** i for i in range(64)]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.edges) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.edges, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def since(self, earlier):
+        histogram = Histogram()
+        histogram.counts = [now - then for now, then in zip(self.counts, earlier.counts)]
+        histogram.count = self.count - earlier.count
+        histogram.total = self.total - earlier.total
+        histogram.max = self.max
+        return histogram
+
+    def copy(self):
+        return self.since(Histogram())
+
+    def percentile(self, p):
+        if not self.count:
+            return 0.0
+        target = self.count * p / 100
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self.edges[i], self.max) if i < len(self.edges) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+            "p50_ms": round(self.percentile(50) * 1000, 3),
+            "p95_ms": round(self.percentile(95) * 1000, 3),
+            "p99_ms": round(self.percentile(99) * 1000, 3),
+        }
+
+
+class Tracer:
+    def __init__(self, capacity=200000):
+        self.spans = deque(maxlen=capacity)
+        self.started = time.perf_counter()
+
+    def instrument(self, obj, names):
+        for name in names:
+            method = getattr(obj, name, None)
+            if method is not None:
+                setattr(obj, name, self.traced(f"{type(obj).__name__}.{name}", method))
+
+    def traced(self, name, method):
+        append = self.spans.append
+        clock = time.perf_counter
+
+        def traced_method(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                append((name, start, clock()))
+
+        return traced_method
+
+    def events(self):
+        pid = os.getpid()
+        started = self.started
+        events = [
+            {"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": "tetris"}},
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": "tk"}},
+        ]
+        for name, start, end in self.spans:
+            events.append(
+                {
+                    "name": name,
+                    "cat": name.partition(".")[0],
+                    "ph": "X",
+                    "ts": round((start - started) * 1e6, 3),
+                    "dur": round((end - start) * 1e6, 3),
+                    "pid": pid,
+                    "tid": 0,
+                }
+            )
+        return events
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "traceEvents": self.events(),
+                    "displayTimeUnit": "ms",
+                    "otherData": {"spans_kept": len(self.spans), "capacity": self.spans.maxlen},
+                },
+                f,
+            )
+
+
+class Metrics:
+    def __init__(self):
+        self.sections = {}
+        self.started = time.perf_counter()
+        self.items = 0
+        self.max_items = 0
+        self.frames = 0
+
+    def record(self, name, seconds):
+        histogram = self.sections.get(name)
+        if histogram is None:
+            histogram = self.sections[name] = Histogram()
+        histogram.add(seconds)
+
+    def instrument(self, obj, names):
+        for name in names:
+            setattr(obj, name, self.timed(name, getattr(obj, name)))
+
+    def timed(self, name, method):
+        record = self.record
+        clock = time.perf_counter
+
+        def timed_method(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                record(name, clock() - start)
+
+        return timed_method
+
+    def count_items(self, canvas):
+        self.items = len(canvas.find_all())
+        self.max_items = max(self.max_items, self.items)
+
+    def section(self, name):
+        return self.sections.get(name) or Histogram()
+
+    def summary(self):
+        return {
+            "duration_s": round(time.perf_counter() - self.started, 3),
+            "canvas_items": self.items,
+            "max_canvas_items": self.max_items,
+            "sections": {name: histogram.summary() for name, histogram in sorted(self.sections.items())},
+        }
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def overlay_text(self):
+        draw = self.section("draw")
+        jitter = self.section("tick_jitter")
+        elapsed = time.perf_counter() - self.started
+        return "\n".join(
+            [
+                f"frames {draw.count / elapsed if elapsed else 0.0:.1f}/s",
+                f"draw p50 {draw.percentile(50) * 1000:.2f}",
+                f"draw p95 {draw.percentile(95) * 1000:.2f}",
+                f"draw p99 {draw.percentile(99) * 1000:.2f}",
+                f"jitter p95 {jitter.percentile(95) * 1000:.1f}",
+                f"items {self.items}",
+            ]
+        )
+
+
+class CanvasRenderer:
+    def __init__(self, view):
+        self.view = view
+        self.canvas = view.canvas
+        self.atlas = view.atlas
+        self.sprites = bool(self.atlas.images)
+        self.cell = view.cell
+        self.build()
+
+    def build(self):
+        view = self.view
+        canvas = self.canvas
+        canvas.delete("all")
+
+        if view.bg_photo:
+            canvas.create_image(0, 0, image=view.bg_photo, anchor="nw")
+        else:
+            canvas.create_rectangle(0, 0, view.canvas_w, view.canvas_h, fill=BG_COLOR, outline="")
+
+        canvas.create_rectangle(
+            view.board_x,
+            view.board_y,
+            view.board_x + view.board_w,
+            view.board_y + view.board_h,
+            fill=BOARD_COLOR,
+            outline="#2a3649",
+            width=2,
+        )
+
+        self.build_board()
+        self.build_hud()
+
+    def build_board(self):
+        view = self.view
+        canvas = self.canvas
+        cell = self.cell
+        self.cells = []
+        for r in range(view.view_rows):
+            row = []
+            for c in range(view.board_cols):
+                block = self.create_block()
+                self.place_block(block, view.board_x + c * cell, view.board_y + r * cell, cell)
+                self.paint_block(block, None)
+                row.append(block)
+            self.cells.append(row)
+        self.cell_colors = [[None] * view.board_cols for _ in range(view.view_rows)]
+
+        self.ghost_items = [self.create_tile() for _ in range(4)]
+        self.piece_blocks = [self.create_block() for _ in range(4)]
+        self.piece_colors = [None for _ in range(4)]
+        for block in self.piece_blocks:
+            self.hide_block(block)
+
+        self.flash_items = []
+        for _ in range(4):
+            glow = canvas.create_rectangle(0, 0, 0, 0, width=2, state="hidden")
+            hot = canvas.create_line(0, 0, 0, 0, width=2, state="hidden")
+            self.flash_items.append((glow, hot))
+        self.lock_items = [canvas.create_rectangle(0, 0, 0, 0, width=2, state="hidden") for _ in range(4)]
+        self.dim_items = [
+            canvas.create_rectangle(
+                view.board_x,
+                view.board_y + r * cell,
+                view.board_x + view.board_w,
+                view.board_y + (r + 1) * cell,
+                fill="#000000",
+                outline="",
+                stipple="gray50",
+                state="hidden",
+            )
+            for r in range(view.view_rows)
+        ]
+
+        self.ghost_key = None
+        self.piece_key = None
+        self.flash_key = None
+        self.lock_key = None
+        self.dim_rows = 0
+
+    def build_hud(self):
+        view = self.view
+        canvas = self.canvas
+        panel_x = view.panel_x
+        top = view.offset_y
+
+        canvas.create_text(
+            panel_x,
+            top + 10,
+            anchor="nw",
+            fill=ACCENT,
+            text="NEON TETRIS",
+            font=("Segoe UI", 16, "bold"),
+        )
+        self.hud_items = {
+            "score": canvas.create_text(
+                panel_x,
+                top + 45,
+                anchor="nw",
+                fill=TEXT_COLOR,
+                font=("Segoe UI", 12, "bold"),
+            ),
+            "lines": canvas.create_text(panel_x, top + 66, anchor="nw", fill=MUTED_TEXT),
+            "level": canvas.create_text(panel_x, top + 86, anchor="nw", fill=MUTED_TEXT),
+            "stack": canvas.create_text(panel_x, top + 106, anchor="nw", fill=MUTED_TEXT),
+        }
+        self.hud_values = {}
+        self.level_fill = MUTED_TEXT
+
+        canvas.create_text(
+            panel_x,
+            top + 130,
+            anchor="nw",
+            fill=TEXT_COLOR,
+            text="Next",
+            font=("Segoe UI", 11, "bold"),
+        )
+        self.preview_x = panel_x
+        self.preview_y = top + 150
+        canvas.create_rectangle(
+            self.preview_x,
+            self.preview_y,
+            self.preview_x + 4 * PREVIEW_CELL,
+            self.preview_y + 4 * PREVIEW_CELL,
+            fill=BOARD_COLOR,
+            outline=GRID_COLOR,
+        )
+        self.preview_items = [self.create_tile() for _ in range(4)]
+        self.preview_key = None
+
+        canvas.create_text(
+            panel_x,
+            top + 240,
+            anchor="nw",
+            fill=TEXT_COLOR,
+            text="Controls",
+            font=("Segoe UI", 11, "bold"),
+        )
+        controls = [
+            (265, "Arrows: move + rotate"),
+            (285, "Down: soft drop"),
+            (305, "Mouse: L rotate, R drop"),
+            (325, "Drag: slide piece"),
+            (355, "P: pause"),
+            (375, "A: autoplay"),
+            (395, "U: undo piece"),
+            (415, "Esc: back to menu"),
+        ]
+        for y, text in controls:
+            canvas.create_text(panel_x, top + y, anchor="nw", fill=MUTED_TEXT, text=text)
+
+        self.pause_item = canvas.create_text(
+            view.board_x + view.board_w // 2,
+            view.board_y + view.board_h // 2,
+            fill=ACCENT,
+            text="PAUSED",
+            font=("Segoe UI", 20, "bold"),
+            state="hidden",
+        )
+        self.pause_shown = False
+
+        self.metrics_item = canvas.create_text(
+            panel_x + 120,
+            top + 45,
+            anchor="nw",
+            fill=MUTED_TEXT,
+            font=("Consolas", 8),
+            state="hidden",
+        )
+        self.metrics_shown = False
+        self.metrics_refreshed = 0.0
+
+    def create_block(self):
+        canvas = self.canvas
+        if self.sprites:
+            return (canvas.create_image(0, 0, anchor="nw"),)
+        rect = canvas.create_rectangle(0, 0, 0, 0)
+        lines = tuple(canvas.create_line(0, 0, 0, 0) for _ in range(4))
+        return (rect,) + lines
+
+    def create_tile(self):
+        if self.sprites:
+            return self.canvas.create_image(0, 0, anchor="nw", state="hidden")
+        return self.canvas.create_rectangle(0, 0, 0, 0, state="hidden")
+
+    def place_tile(self, item, x0, y0, size):
+        if self.sprites:
+            self.canvas.coords(item, x0, y0)
+        else:
+            self.canvas.coords(item, x0, y0, x0 + size, y0 + size)
+
+    def place_block(self, block, x0, y0, size):
+        coords = self.canvas.coords
+        if self.sprites:
+            coords(block[0], x0, y0)
+            return
+        x1 = x0 + size
+        y1 = y0 + size
+        coords(block[0], x0, y0, x1, y1)
+        coords(block[1], x0 + 2, y0 + 2, x1 - 2, y0 + 2)
+        coords(block[2], x0 + 2, y0 + 2, x0 + 2, y1 - 2)
+        coords(block[3], x0 + 2, y1 - 2, x1 - 2, y1 - 2)
+        coords(block[4], x1 - 2, y0 + 2, x1 - 2, y1 - 2)
+
+    def paint_block(self, block, color):
+        itemconfig = self.canvas.itemconfig
+        if self.sprites:
+            if color is None:
+                image = self.atlas.get(GRID_COLOR, self.cell, "empty")
+            else:
+                image = self.atlas.get(color, self.cell, "block")
+            itemconfig(block[0], image=image, state="normal")
+            return
+        if color is None:
+            itemconfig(block[0], fill="", outline=GRID_COLOR, state="normal")
+            for item in block[1:]:
+                itemconfig(item, state="hidden")
+            return
+        dark = shade_color(color, 0.7)
+        light = shade_color(color, 1.25)
+        itemconfig(block[0], fill=color, outline=dark, state="normal")
+        itemconfig(block[1], fill=light, state="normal")
+        itemconfig(block[2], fill=light, state="normal")
+        itemconfig(block[3], fill=dark, state="normal")
+        itemconfig(block[4], fill=dark, state="normal")
+
+    def hide_block(self, block):
+        for item in block:
+            self.canvas.itemconfig(item, state="hidden")
+
+    def render(self):
+        self.draw_board()
+        self.draw_ghost()
+        self.draw_piece()
+        self.draw_line_flash()
+        self.draw_lock_flash()
+        self.draw_game_over()
+        self.draw_hud()
+
+    def render_tweens(self, tweens):
+        names = {tween.name for tween in tweens}
+        if "clear" in names:
+            self.draw_line_flash()
+        if "lock" in names:
+            self.draw_lock_flash()
+        if "game_over" in names:
+            self.draw_game_over()
+        if "level" in names:
+            self.draw_level()
+
+    def fade(self, name):
+        view = self.view
+        tween = view.animator.get(name)
+        if tween is None:
+            return tween, 0
+        return tween, tween.fade(view.frame_time, FADE_STEPS)
+
+    def flash_colors(self, level):
+        glow = mix_color(BOARD_COLOR, shade_color(ACCENT, 1.4), level / FADE_STEPS)
+        return glow, shade_color(glow, 1.3)
+
+    def lock_color(self, color, level):
+        return mix_color(color, "#ffffff", 0.6 * level / FADE_STEPS)
+
+    def dimmed_rows(self):
+        view = self.view
+        if view.running:
+            return 0
+        tween = view.animator.get("game_over")
+        if tween is None:
+            return view.view_rows
+        return math.ceil(tween.progress(view.frame_time) * view.view_rows)
+
+    def draw_board(self):
+        view = self.view
+        grid = view.state.grid
+        top = view.top_row
+        shown = self.cell_colors
+        for s, shown_row in enumerate(shown):
+            row = grid[top + s]
+            if row == shown_row:
+                continue
+            blocks = self.cells[s]
+            for c, color in enumerate(row):
+                if color != shown_row[c]:
+                    self.paint_block(blocks[c], color)
+                    shown_row[c] = color
+
+    def piece_cells(self, kind, rotation, x, y):
+        return [(x + c, y + r) for c, r in ROTATIONS[kind][rotation].cells]
+
+    def visible_cells(self, kind, rotation, x, y):
+        view = self.view
+        top = view.top_row
+        return [
+            (px, py - top) for px, py in self.piece_cells(kind, rotation, x, y) if 0 <= py - top < view.view_rows
+        ]
+
+    def draw_ghost(self):
+        view = self.view
+        state = view.state
+        if state.game_over:
+            key = None
+        else:
+            piece = state.current
+            key = (piece.kind, piece.rotation, piece.x, state.ghost_y(), view.top_row)
+        if key == self.ghost_key:
+            return
+        self.ghost_key = key
+
+        canvas = self.canvas
+        cell = self.cell
+        cells = self.visible_cells(*key[:4]) if key else []
+        if not key:
+            style = {}
+        elif self.sprites:
+            style = {"image": self.atlas.get(COLORS[key[0]], cell, "ghost")}
+        else:
+            style = {"outline": shade_color(COLORS[key[0]], 0.35)}
+        for i, item in enumerate(self.ghost_items):
+            if i < len(cells):
+                gx, gy = cells[i]
+                self.place_tile(item, view.board_x + gx * cell, view.board_y + gy * cell, cell)
+                canvas.itemconfig(item, state="normal", **style)
+            else:
+                canvas.itemconfig(item, state="hidden")
+
+    def draw_piece(self):
+        view = self.view
+        state = view.state
+        if state.game_over:
+            key = None
+        else:
+            piece = state.current
+            key = piece.key() + (view.top_row,)
+        if key == self.piece_key:
+            return
+        color = COLORS[key[0]] if key else None
+        self.piece_key = key
+
+        cell = self.cell
+        cells = self.visible_cells(*key[:4]) if key else []
+        for i, block in enumerate(self.piece_blocks):
+            if i < len(cells):
+                px, py = cells[i]
+                self.place_block(block, view.board_x + px * cell, view.board_y + py * cell, cell)
+                if self.piece_colors[i] != color:
+                    self.paint_block(block, color)
+                    self.piece_colors[i] = color
+            elif self.piece_colors[i] is not None:
+                self.hide_block(block)
+                self.piece_colors[i] = None
+
+    def draw_line_flash(self):
+        view = self.view
+        top = view.top_row
+        tween, level = self.fade("clear")
+        rows = tuple(r - top for r in tween.rows if 0 <= r - top < view.view_rows) if level else ()
+        key = (rows, level) if rows else None
+        if key == self.flash_key:
+            return
+        self.flash_key = key
+
+        canvas = self.canvas
+        cell = self.cell
+        glow, hot = self.flash_colors(level)
+        for i, (glow_item, hot_item) in enumerate(self.flash_items):
+            if i >= len(rows):
+                canvas.itemconfig(glow_item, state="hidden")
+                canvas.itemconfig(hot_item, state="hidden")
+                continue
+            y0 = view.board_y + rows[i] * cell
+            y1 = y0 + cell
+            x0 = view.board_x + 2
+            x1 = view.board_x + view.board_w - 2
+            canvas.coords(glow_item, x0, y0 + 2, x1, y1 - 2)
+            canvas.coords(hot_item, x0, (y0 + y1) // 2, x1, (y0 + y1) // 2)
+            canvas.itemconfig(glow_item, outline=glow, state="normal")
+            canvas.itemconfig(hot_item, fill=hot, state="normal")
+
+    def draw_lock_flash(self):
+        view = self.view
+        top = view.top_row
+        tween, level = self.fade("lock")
+        key = None
+        if level:
+            color, cells = tween.data
+            cells = tuple((c, r - top) for c, r in cells if 0 <= r - top < view.view_rows)
+            key = (cells, self.lock_color(color, level))
+        if key == self.lock_key:
+            return
+        self.lock_key = key
+
+        canvas = self.canvas
+        cell = self.cell
+        cells, outline = key if key else ((), None)
+        for i, item in enumerate(self.lock_items):
+            if i < len(cells):
+                x0 = view.board_x + cells[i][0] * cell
+                y0 = view.board_y + cells[i][1] * cell
+                canvas.coords(item, x0 + 1, y0 + 1, x0 + cell - 1, y0 + cell - 1)
+                canvas.itemconfig(item, outline=outline, state="normal")
+            else:
+                canvas.itemconfig(item, state="hidden")
+
+    def draw_game_over(self):
+        rows = self.dimmed_rows()
+        if rows == self.dim_rows:
+            return
+        items = self.dim_items
+        bottom = len(items)
+        low, high = sorted((self.dim_rows, rows))
+        state = "normal" if rows > self.dim_rows else "hidden"
+        for i in range(low, high):
+            self.canvas.itemconfig(items[bottom - 1 - i], state=state)
+        self.dim_rows = rows
+        self.canvas.tag_raise(self.pause_item)
+
+    def draw_hud(self):
+        state = self.view.state
+        self.set_hud_text("score", f"Score  {state.score}")
+        self.set_hud_text("lines", f"Lines   {state.lines}")
+        self.set_hud_text("level", f"Level   {state.level}")
+        self.set_hud_text("stack", f"Stack   {state.stack_height()}")
+        self.draw_preview(state.next_piece.kind)
+        self.draw_level()
+
+        paused = self.view.paused
+        if paused != self.pause_shown:
+            self.pause_shown = paused
+            self.canvas.itemconfig(self.pause_item, state="normal" if paused else "hidden")
+
+        self.draw_metrics()
+
+    def draw_level(self):
+        _tween, level = self.fade("level")
+        fill = mix_color(MUTED_TEXT, ACCENT, level / FADE_STEPS)
+        if fill != self.level_fill:
+            self.level_fill = fill
+            self.canvas.itemconfig(self.hud_items["level"], fill=fill)
+
+    def draw_metrics(self):
+        view = self.view
+        shown = view.show_metrics and view.metrics is not None
+        if shown != self.metrics_shown:
+            self.metrics_shown = shown
+            self.metrics_refreshed = 0.0
+            self.canvas.itemconfig(self.metrics_item, state="normal" if shown else "hidden")
+        if not shown:
+            return
+        now = time.perf_counter()
+        if now - self.metrics_refreshed < 0.25:
+            return
+        self.metrics_refreshed = now
+        view.metrics.count_items(self.canvas)
+        self.canvas.itemconfig(self.metrics_item, text=view.metrics.overlay_text())
+
+    def set_hud_text(self, name, text):
+        if self.hud_values.get(name) != text:
+            self.hud_values[name] = text
+            self.canvas.itemconfig(self.hud_items[name], text=text)
+
+    def draw_preview(self, kind):
+        if kind == self.preview_key:
+            return
+        self.preview_key = kind
+
+        cell = PREVIEW_CELL
+        box = 4
+        canvas = self.canvas
+        color = COLORS[kind]
+        shape = ROTATIONS[kind][0]
+        shape_w = shape.right - shape.left + 1
+        shape_h = shape.bottom - shape.top + 1
+        start_x = self.preview_x + (box - shape_w) * cell // 2 - shape.left * cell
+        start_y = self.preview_y + (box - shape_h) * cell // 2 - shape.top * cell
+        cells = shape.cells
+        if self.sprites:
+            style = {"image": self.atlas.get(color, cell, "preview")}
+        else:
+            style = {"fill": color, "outline": shade_color(color, 0.7)}
+        for i, item in enumerate(self.preview_items):
+            if i < len(cells):
+                px = start_x + cells[i][0] * cell
+                py = start_y + cells[i][1] * cell
+                self.place_tile(item, px, py, cell)
+                canvas.itemconfig(item, state="normal", **style)
+            else:
+                canvas.itemconfig(item, state="hidden")
+
+
+class TileGrid:
+    def __init__(self, cols, rows):
+        self.cols = cols
+        self.view_rows = rows
+        self.shown = [[(None, "empty")] * cols for _ in range(rows)]
+        self.grid_shown = [None] * rows
+        self.shown_top = 0
+        self.overlay = {}
+
+    def draw(self, grid, top, overlay, rows=None):
+        cols = self.cols
+        view_rows = self.view_rows
+        grid_shown = self.grid_shown
+        dirty = set(self.overlay)
+        dirty.update(overlay)
+        self.overlay = overlay
+        if rows is None:
+            if top != self.shown_top:
+                self.shown_top = top
+                grid_shown[:] = [None] * view_rows
+            slots = range(view_rows)
+        else:
+            dirty = {cell for cell in dirty if cell[1] in rows}
+            slots = [r - top for r in rows if 0 <= r - top < view_rows]
+        for s in slots:
+            row = grid[top + s]
+            if row != grid_shown[s]:
+                dirty.update((c, top + s) for c in range(cols))
+                grid_shown[s] = row[:]
+
+        shown = self.shown
+        changes = []
+        for c, r in dirty:
+            s = r - top
+            if s < 0 or s >= view_rows:
+                continue
+            key = overlay.get((c, r))
+            if key is None or (key[1] == "ghost" and grid[r][c] is not None):
+                color = grid[r][c]
+                key = (color, "block") if color else (None, "empty")
+            if shown[s][c] != key:
+                shown[s][c] = key
+                changes.append((c, s, key))
+        return changes
+
+
+class Framebuffer(TileGrid):
+    def __init__(self, canvas, x, y, cols, rows, cell, tiles=None, scratch=None):
+        super().__init__(cols, rows)
+        self.canvas = canvas
+        self.cell = cell
+        self.width = cols * cell
+        self.height = rows * cell
+        self.tiles = {} if tiles is None else tiles
+        self.buffer = Image.new("RGB", (self.width, self.height), BOARD_COLOR)
+        empty = self.tile(None, "empty")
+        for r in range(rows):
+            for c in range(cols):
+                self.buffer.paste(empty, (c * cell, r * cell))
+        self.photo = ImageTk.PhotoImage(self.buffer)
+        self.scratch = scratch or ImageTk.PhotoImage("RGB", (self.width, self.height))
+        canvas.create_image(x, y, image=self.photo, anchor="nw")
+
+    def tile(self, color, style):
+        key = (color, style)
+        tile = self.tiles.get(key)
+        if tile is None:
+            tile = self.tiles[key] = render_tile(color, self.cell, style)
+        return tile
+
+    def draw(self, grid, top, overlay, rows=None):
+        changes = super().draw(grid, top, overlay, rows)
+        cell = self.cell
+        for c, s, key in changes:
+            self.buffer.paste(self.tile(*key), (c * cell, s * cell))
+        if changes:
+            self.push_rows(sorted({s for _c, s, _key in changes}))
+        return changes
+
+    def push_rows(self, rows):
+        if len(rows) == self.view_rows:
+            self.photo.paste(self.buffer)
+            return
+        start = rows[0]
+        end = start
+        for r in rows[1:] + [None]:
+            if r == end + 1:
+                end = r
+                continue
+            self.push_band(start, end + 1)
+            if r is not None:
+                start = end = r
+
+    def push_band(self, first, last):
+        width = self.width
+        y0 = first * self.cell
+        y1 = last * self.cell
+        self.scratch.paste(self.buffer.crop((0, y0, width, y1)))
+        self.canvas.tk.call(str(self.photo), "copy", str(self.scratch), "-from", 0, 0, width, y1 - y0, "-to", 0, y0)
+
+
+class FramebufferRenderer(CanvasRenderer):
+    def build_board(self):
+        view = self.view
+        self.frame = Framebuffer(self.canvas, view.board_x, view.board_y, view.board_cols, view.view_rows, self.cell)
+
+    def render(self):
+        self.draw_frame()
+        self.draw_hud()
+
+    def render_tweens(self, tweens):
+        rows = set()
+        for tween in tweens:
+            rows.update(tween.rows)
+        if rows:
+            self.draw_frame(rows)
+        if any(tween.region == "level" for tween in tweens):
+            self.draw_level()
+
+    def build_overlay(self):
+        view = self.view
+        state = view.state
+        overlay = {}
+        if not state.game_over:
+            piece = state.current
+            color = piece.color
+            for c, r in self.piece_cells(piece.kind, piece.rotation, piece.x, state.ghost_y()):
+                overlay[c, r] = (color, "ghost")
+            for c, r in piece.cells():
+                overlay[c, r] = (color, "block")
+
+        grid = state.grid
+        tween, level = self.fade("lock")
+        if level:
+            color, cells = tween.data
+            lock = (self.lock_color(color, level), "block")
+            for c, r in cells:
+                if r >= 0 and grid[r][c] is not None:
+                    overlay[c, r] = lock
+        tween, level = self.fade("clear")
+        if level:
+            flash = (self.flash_colors(level)[0], "flash")
+            for r in tween.rows:
+                for c in range(view.board_cols):
+                    overlay[c, r] = flash
+        dimmed = self.dimmed_rows()
+        if dimmed:
+            bottom = view.top_row + view.view_rows
+            for r in range(bottom - dimmed, bottom):
+                row = grid[r]
+                for c in range(view.board_cols):
+                    overlay[c, r] = (row[c], "dim")
+        return overlay
+
+    def draw_frame(self, rows=None):
+        view = self.view
+        self.frame.draw(view.state.grid, view.top_row, self.build_overlay(), rows)
+
+
+RENDERERS = {
+    "canvas": CanvasRenderer,
+    "framebuffer": FramebufferRenderer,
+}
+
+
+def make_renderer(view, name=None):
+    name = name or os.environ.get("TETRIS_RENDERER") or "canvas"
+    if name not in RENDERERS:
+        raise ValueError(f"Unknown renderer: {name}")
+    if name == "framebuffer" and not (ImageTk and ImageDraw):
+        name = "canvas"
+    return RENDERERS[name](view)
+
+
+class FrameLoop:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.paused_at = None
+        self.tick_id = None
+        self.tick_deadline = None
+        self.draw_id = None
+        self.last_draw = 0.0
+        self.frame_interval = 1 / 60
+
+    def clock(self):
+        if self.paused_at is not None:
+            elapsed = self.paused_at - self.started
+        else:
+            elapsed = time.monotonic() - self.started
+        return round(elapsed * 1000) / 1000
+
+    def schedule(self):
+        if not self.running or self.paused:
+            return
+        deadline = self.next_deadline()
+        if deadline is None:
+            return
+        if self.tick_id is not None:
+            if self.tick_deadline <= deadline:
+                return
+            self.root.after_cancel(self.tick_id)
+        delay = max(1, math.ceil((deadline - self.clock()) * 1000))
+        self.tick_deadline = deadline
+        self.tick_id = self.root.after(delay, self.tick)
+
+    def cancel_tick(self):
+        if self.tick_id is not None:
+            self.root.after_cancel(self.tick_id)
+            self.tick_id = None
+            self.tick_deadline = None
+
+    def request_draw(self):
+        if self.draw_id is not None:
+            return
+        wait = self.last_draw + self.frame_interval - time.monotonic()
+        if wait > 0:
+            self.draw_id = self.root.after(max(1, math.ceil(wait * 1000)), self.flush_draw)
+        else:
+            self.draw_id = self.root.after_idle(self.flush_draw)
+
+    def cancel_draw(self):
+        if self.draw_id is not None:
+            self.root.after_cancel(self.draw_id)
+            self.draw_id = None
+
+
+class Tetris(FrameLoop):
+    def __init__(
+        self,
+        root,
+        on_close=None,
+        owns_root=True,
+        seed=None,
+        metrics_path=None,
+        trace_path=None,
+        replay=None,
+        record_dir=None,
+        assets=None,
+        reusable=False,
+        renderer=None,
+        cols=None,
+        rows=None,
+        cell=None,
+        spectate=None,
+        stats=None,
+        das=DAS,
+        arr=ARR,
+    ):
         self.root = root
         self.on_close = on_close
         self.owns_root = owns_root
+        self.reusable = reusable and not owns_root
+        self.metrics_path = metrics_path or os.environ.get("TETRIS_METRICS")
+        self.metrics = None
+        self.trace_path = trace_path or os.environ.get("TETRIS_TRACE")
+        self.tracer = None
+        self.show_metrics = False
+
+        if replay:
+            cols, rows = replay.width, replay.height
+            das, arr = replay.das, replay.arr
+        elif cols is None and os.environ.get("TETRIS_BOARD"):
+            cols, rows = (int(value) for value in os.environ["TETRIS_BOARD"].lower().split("x"))
+        if cell is None and os.environ.get("TETRIS_CELL"):
+            cell = int(os.environ["TETRIS_CELL"])
+        self.board_cols = cols or COLS
+        self.board_rows = rows or ROWS
+        self.cell = cell or max(MIN_CELL, min(CELL, MAX_BOARD_W // self.board_cols))
+        self.view_rows = min(self.board_rows, max(ROWS, BOARD_H // self.cell))
+        self.top_row = 0
+        self.board_w = self.board_cols * self.cell
+        self.board_h = self.view_rows * self.cell
+        self.canvas_w = self.board_w + PANEL_W + MARGIN * 2
+        self.canvas_h = max(self.board_h, HUD_H) + MARGIN * 2
 
         self.root.title("Tetris")
         self.root.resizable(False, False)
         self.canvas = tk.Canvas(
             root,
-            width=CANVAS_W,
-            height=CANVAS_H,
+            width=self.canvas_w,
+            height=self.canvas_h,
             bg=BG_COLOR,
             highlightthickness=0,
         )
@@ -133,30 +1198,75 @@ class Tetris:
         self.offset_y = MARGIN
         self.board_x = self.offset_x
         self.board_y = self.offset_y
-        self.panel_x = self.offset_x + BOARD_W + 20
-
-        self.grid = [[None for _ in range(COLS)] for _ in range(ROWS)]
-        self.score = 0
-        self.lines = 0
-        self.level = 1
-        self.game_over = False
+        self.panel_x = self.offset_x + self.board_w + 20
+
+        self.player = ReplayPlayer(replay) if replay else None
+        self.history = UNDO_HISTORY
+        if replay:
+            seed = replay.seed
+            self.history = replay.history
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.state = GameState(
+            seed=self.seed,
+            events=True,
+            history=self.history,
+            width=self.board_cols,
+            height=self.board_rows,
+            das=das,
+            arr=arr,
+        )
+        self.record_dir = record_dir or os.environ.get("TETRIS_RECORD_DIR")
+        self.recorder = None
+        if self.record_dir and not self.player:
+            self.recorder = self.new_recorder()
+        self.publisher = None
+        spectate = spectate or os.environ.get("TETRIS_SPECTATE")
+        if spectate:
+            from spectator import Publisher
+
+            try:
+                self.publisher = Publisher(spectate).start()
+            except OSError as exc:
+                print(f"Failed to start spectator stream on {spectate}: {exc}")
+        self.stats = stats
+        self.owns_stats = stats is None and bool(os.environ.get("TETRIS_STATS"))
+        if self.owns_stats:
+            self.stats = StatsStore()
+        self.stats_saved = False
+        self.assisted = False
+        self.frames_start = None
+        super().__init__()
         self.running = True
-        self.base_interval = 0.55
-        self.drop_interval = self.base_interval
-        self.soft_drop_interval = 0.05
-        self.last_drop = time.monotonic()
-        self.soft_drop_active = False
-        self.flash_rows = []
-        self.flash_ticks = 0
-        self.flash_duration = 10
+        self.pause_reasons = set()
+        self.animator = Animator()
+        self.frame_time = 0.0
+        self.full_frame = True
+        self.durations = {"clear": 0.25, "lock": 0.12, "level": 0.8, "game_over": 0.6}
+        self.level = self.state.level
+        self.bot = None
+        self.bot_actions = []
+        self.bot_pieces = None
+        self.bot_next = None
+        self.bot_interval = 0.05
 
         self.bg_photo = None
-        self.prepare_background()
-
-        self.current = self.new_piece()
-        self.next_piece = self.new_piece()
+        if assets:
+            self.atlas = assets["atlas"]
+            if (self.canvas_w, self.canvas_h) == (CANVAS_W, CANVAS_H):
+                self.bg_photo = assets["background"]
+            else:
+                self.prepare_background()
+        else:
+            self.prepare_background()
+            self.atlas = SpriteAtlas()
+        self.renderer = make_renderer(self, renderer)
 
         self.overlay = None
+        self.overlay_stats = None
+        if self.metrics_path:
+            self.enable_metrics()
+        if self.trace_path:
+            self.enable_tracing()
         self.bind_inputs()
         self.tick()
 
@@ -165,409 +1275,389 @@ class Tetris:
     def prepare_background(self):
         if not ImageTk:
             return
-        img = generate_background(CANVAS_W, CANVAS_H)
+        img = load_background(self.canvas_w, self.canvas_h)
         if img:
             self.bg_photo = ImageTk.PhotoImage(img)
 
     def bind_inputs(self):
-        self.root.bind("<Left>", lambda e: self.move(-1, 0))
-        self.root.bind("<Right>", lambda e: self.move(1, 0))
+        self.root.bind("<KeyPress-Left>", lambda e: self.queue_input(LEFT_PRESS))
+        self.root.bind("<KeyRelease-Left>", lambda e: self.queue_input(LEFT_RELEASE))
+        self.root.bind("<KeyPress-Right>", lambda e: self.queue_input(RIGHT_PRESS))
+        self.root.bind("<KeyRelease-Right>", lambda e: self.queue_input(RIGHT_RELEASE))
         self.root.bind("<Up>", lambda e: self.rotate_piece())
         self.root.bind("<Escape>", lambda e: self.handle_close())
+        self.root.bind("<KeyPress-p>", lambda e: self.toggle_pause())
+        self.root.bind("<F3>", lambda e: self.toggle_metrics())
+        self.root.bind("<KeyPress-a>", lambda e: self.toggle_autoplay())
+        self.root.bind("<KeyPress-u>", lambda e: self.queue_input(UNDO))
+        self.root.bind("<BackSpace>", lambda e: self.queue_input(UNDO))
 
         self.root.bind("<KeyPress-Down>", self.start_soft_drop)
         self.root.bind("<KeyRelease-Down>", self.stop_soft_drop)
 
+        self.root.bind("<Unmap>", lambda e: self.on_window_event(e, "hidden", True))
+        self.root.bind("<Map>", lambda e: self.on_window_event(e, "hidden", False))
+        self.root.bind("<FocusOut>", lambda e: self.on_window_event(e, "unfocused", True))
+        self.root.bind("<FocusIn>", lambda e: self.on_window_event(e, "unfocused", False))
+
         self.canvas.bind("<Button-1>", lambda e: self.rotate_piece())
         self.canvas.bind("<Button-3>", lambda e: self.hard_drop())
         self.canvas.bind("<B1-Motion>", self.drag_move)
 
     def handle_close(self):
+        self.cancel_tick()
+        self.cancel_draw()
+        self.save_recording()
+        self.save_stats()
+        if self.metrics and self.metrics_path:
+            self.metrics.count_items(self.canvas)
+            try:
+                self.metrics.dump(self.metrics_path)
+            except OSError as exc:
+                print(f"Failed to write metrics: {exc}")
+        if self.tracer:
+            try:
+                self.tracer.dump(self.trace_path)
+            except OSError as exc:
+                print(f"Failed to write trace: {exc}")
+        if self.publisher and not self.reusable:
+            self.publisher.close()
+        if self.owns_stats and not self.reusable:
+            self.stats.close()
+        if self.reusable:
+            self.running = False
+            self.root.withdraw()
         if self.on_close:
             self.on_close()
-        self.root.destroy()
-
-    def new_piece(self):
-        shape, color = random.choice(SHAPES)
-        shape = [row[:] for row in shape]
-        x = COLS // 2 - len(shape[0]) // 2
-        y = -len(shape)
-        return {"shape": shape, "color": color, "x": x, "y": y}
-
-    def collides(self, shape, x, y):
-        for r, row in enumerate(shape):
-            for c, val in enumerate(row):
-                if not val:
-                    continue
-                nx = x + c
-                ny = y + r
-                if nx < 0 or nx >= COLS or ny >= ROWS:
-                    return True
-                if ny >= 0 and self.grid[ny][nx]:
-                    return True
-        return False
-
-    def move(self, dx, dy):
-        if self.game_over:
-            return False
-        piece = self.current
-        nx = piece["x"] + dx
-        ny = piece["y"] + dy
-        if not self.collides(piece["shape"], nx, ny):
-            piece["x"] = nx
-            piece["y"] = ny
-            self.draw()
-            return True
-        return False
+        if not self.reusable:
+            self.root.destroy()
+
+    def show(self):
+        self.root.deiconify()
+        self.root.lift()
+        self.root.focus_force()
+        self.bot = None
+        self.bot_next = None
+        self.show_metrics = False
+        self.reset_game()
+
+    def enable_metrics(self):
+        if self.metrics is None:
+            self.metrics = Metrics()
+            self.frames_start = Histogram()
+            self.metrics.instrument(self, ("tick", "draw"))
+            self.metrics.instrument(self.state, ("advance", "lock_piece", "clear_lines"))
+
+    def enable_tracing(self):
+        self.tracer = Tracer()
+        self.tracer.instrument(
+            self,
+            ("tick", "flush_draw", "draw", "queue_input", "apply_input", "drag_move", "toggle_pause", "bot_step"),
+        )
+        self.tracer.instrument(self.renderer, ("draw_board", "draw_frame", "draw_ghost", "draw_piece", "draw_hud"))
+        self.tracer.instrument(self.state, ("advance", "apply_input", "lock_piece", "clear_lines", "undo"))
 
-    def rotate_piece(self):
-        if self.game_over:
-            return
-        piece = self.current
-        rotated = rotate(piece["shape"])
-        if not self.collides(rotated, piece["x"], piece["y"]):
-            piece["shape"] = rotated
-        else:
-            for dx in (-1, 1, -2, 2):
-                if not self.collides(rotated, piece["x"] + dx, piece["y"]):
-                    piece["x"] += dx
-                    piece["shape"] = rotated
-                    break
-        self.draw()
+    def toggle_metrics(self):
+        self.enable_metrics()
+        self.show_metrics = not self.show_metrics
+        self.request_draw()
 
-    def start_soft_drop(self, _event):
-        self.soft_drop_active = True
+    def new_recorder(self):
+        state = self.state
+        return Recorder(self.seed, self.history, state.width, state.height, state.das, state.arr)
 
-    def stop_soft_drop(self, _event):
-        self.soft_drop_active = False
+    def save_recording(self):
+        if not self.recorder or self.recorder.finished:
+            return
+        replay = self.recorder.finish(self.clock())
+        if not replay.events:
+            return
+        name = time.strftime("tetris-%Y%m%d-%H%M%S") + f"-{self.seed}.replay"
+        try:
+            os.makedirs(self.record_dir, exist_ok=True)
+            replay.save(os.path.join(self.record_dir, name))
+        except OSError as exc:
+            print(f"Failed to write replay: {exc}")
+
+    def save_stats(self):
+        state = self.state
+        if not self.stats or self.player or self.stats_saved or not state.pieces:
+            return
+        self.stats_saved = True
+        frame_mean = frame_p99 = None
+        if self.metrics:
+            frames = self.metrics.section("draw").since(self.frames_start)
+            if frames.count:
+                frame_mean = round(frames.total / frames.count * 1000, 3)
+                frame_p99 = round(frames.percentile(99) * 1000, 3)
+        self.stats.record(
+            score=state.score,
+            lines=state.lines,
+            level=state.level,
+            duration=self.clock(),
+            pieces=state.pieces,
+            frame_mean_ms=frame_mean,
+            frame_p99_ms=frame_p99,
+            seed=self.seed,
+            board=f"{self.board_cols}x{self.board_rows}",
+            finished=int(state.game_over),
+            autoplay=int(self.assisted),
+        )
 
-    def hard_drop(self):
-        if self.game_over:
+    def toggle_autoplay(self):
+        if self.player:
             return
-        distance = 0
-        while self.move(0, 1):
-            distance += 1
-        self.score += distance * 2
-        self.lock_piece()
-
-    def lock_piece(self):
-        piece = self.current
-        for r, row in enumerate(piece["shape"]):
-            for c, val in enumerate(row):
-                if not val:
-                    continue
-                ny = piece["y"] + r
-                if ny < 0:
-                    self.end_game()
-                    return
-
-        for r, row in enumerate(piece["shape"]):
-            for c, val in enumerate(row):
-                if not val:
-                    continue
-                nx = piece["x"] + c
-                ny = piece["y"] + r
-                if ny >= 0:
-                    self.grid[ny][nx] = piece["color"]
-
-        self.clear_lines()
-        self.current = self.next_piece
-        self.next_piece = self.new_piece()
-        if self.collides(self.current["shape"], self.current["x"], self.current["y"]):
-            self.end_game()
+        if self.bot:
+            self.bot = None
+            self.bot_next = None
         else:
-            self.draw()
+            self.bot = Autoplayer()
+            self.bot_next = self.clock()
+            self.assisted = True
+        self.bot_actions = []
+        self.bot_pieces = None
+        self.schedule()
+
+    def bot_step(self, now):
+        if self.bot_next is None or now < self.bot_next:
+            return
+        state = self.state
+        if state.pieces != self.bot_pieces or not self.bot_actions:
+            self.bot_actions = self.bot.plan(state)
+            self.bot_pieces = state.pieces
+        if self.bot_actions:
+            action = self.bot_actions.pop(0)
+            if not self.apply_input(action):
+                self.bot_actions = []
+        self.bot_next = now + self.bot_interval
+
+    @property
+    def paused(self):
+        return bool(self.pause_reasons)
+
+    def accepts_input(self):
+        return self.running and not self.pause_reasons and not self.player
+
+    def toggle_pause(self):
+        if not self.running:
+            return
+        self.set_paused("user", "user" not in self.pause_reasons)
+
+    def on_window_event(self, event, reason, paused):
+        if event.widget is self.root:
+            self.set_paused(reason, paused)
 
-    def clear_lines(self):
-        cleared_rows = [i for i, row in enumerate(self.grid) if all(cell is not None for cell in row)]
-        if not cleared_rows:
+    def set_paused(self, reason, paused):
+        was_paused = self.paused
+        if paused:
+            self.pause_reasons.add(reason)
+        else:
+            self.pause_reasons.discard(reason)
+        if was_paused == self.paused:
             return
 
-        new_grid = [row for i, row in enumerate(self.grid) if i not in cleared_rows]
-        for _ in range(len(cleared_rows)):
-            new_grid.insert(0, [None for _ in range(COLS)])
+        if self.paused:
+            now = self.clock()
+            self.paused_at = self.started + now
+            if not self.player:
+                self.state.advance(now)
+                self.state.release_all()
+                self.process_events()
+            self.cancel_tick()
+        else:
+            self.started += time.monotonic() - self.paused_at
+            self.paused_at = None
+            self.tick()
+        self.request_draw()
+
+    def apply_input(self, action, arg=None):
+        if not self.accepts_input():
+            return False
+        self.state.advance(self.clock())
+        done = self.state.apply_input(action, arg)
+        self.sync()
+        return done
+
+    def queue_input(self, action, arg=None):
+        if not self.accepts_input():
+            return False
+        self.state.queue_input(self.clock(), action, arg)
+        self.request_draw()
+        return True
 
-        self.grid = new_grid
-        self.lines += len(cleared_rows)
-        self.score += LINE_SCORES.get(len(cleared_rows), len(cleared_rows) * 200)
-        self.level = 1 + self.lines // 10
-        self.drop_interval = max(0.08, self.base_interval - (self.level - 1) * 0.05)
+    def record(self, now, action, arg=None):
+        if self.recorder:
+            self.recorder.record(now, action, arg)
 
-        self.flash_rows = cleared_rows
-        self.flash_ticks = self.flash_duration
+    def rotate_piece(self):
+        return self.queue_input(ROTATE)
+
+    def start_soft_drop(self, _event):
+        self.queue_input(SOFT_DROP_START)
+
+    def stop_soft_drop(self, _event):
+        self.queue_input(SOFT_DROP_STOP)
+
+    def hard_drop(self):
+        return self.queue_input(HARD_DROP)
+
+    def drag_move(self, event):
+        if event.x < self.board_x or event.x > self.board_x + self.board_w:
+            return
+        self.queue_input(DRAG, (event.x - self.board_x) // self.cell)
+
+    def sync(self):
+        if self.process_events():
+            self.request_draw()
+            self.schedule()
+
+    def process_events(self):
+        for event in self.state.drain_events():
+            if event[0] == "input":
+                self.record(*event[1:])
+            elif event[0] == "lock":
+                self.animate("lock", rows={cell[1] for cell in event[2]}, data=event[1:])
+            elif event[0] == "clear":
+                self.animator.cancel("lock")
+                self.animate("clear", rows=event[1])
+                if self.state.level != self.level:
+                    self.animate("level", region="level")
+            elif event[0] == "undo":
+                self.animator.clear()
+            elif event[0] == "game_over":
+                self.end_game()
+                return False
+        self.level = self.state.level
+        return True
+
+    def animate(self, name, rows=(), region=None, easing=ease_out, data=None):
+        return self.animator.start(name, self.clock(), self.durations[name], rows, region, easing, data)
 
     def end_game(self):
-        self.game_over = True
         self.running = False
-        self.draw()
-        self.show_game_over()
+        self.cancel_tick()
+        self.save_recording()
+        self.save_stats()
+        self.animate("game_over", rows=range(self.top_row, self.top_row + self.view_rows), easing=ease_in_out)
+        self.request_draw()
 
     def reset_game(self):
-        self.grid = [[None for _ in range(COLS)] for _ in range(ROWS)]
-        self.score = 0
-        self.lines = 0
-        self.level = 1
-        self.game_over = False
+        self.cancel_tick()
+        self.save_recording()
+        self.save_stats()
+        if self.player:
+            self.player = ReplayPlayer(self.player.replay)
+        else:
+            self.seed = random.getrandbits(32)
+        if self.recorder:
+            self.recorder = self.new_recorder()
+        self.state.reset(self.seed)
         self.running = True
-        self.drop_interval = self.base_interval
-        self.last_drop = time.monotonic()
-        self.soft_drop_active = False
-        self.flash_rows = []
-        self.flash_ticks = 0
-        self.current = self.new_piece()
-        self.next_piece = self.new_piece()
+        self.started = time.monotonic()
+        self.pause_reasons.discard("user")
+        self.paused_at = self.started if self.paused else None
+        self.animator.clear()
+        self.animator.update(self.clock())
+        self.level = self.state.level
+        self.stats_saved = False
+        self.assisted = bool(self.bot)
+        if self.metrics:
+            self.frames_start = self.metrics.section("draw").copy()
+        self.bot_actions = []
+        self.bot_pieces = None
+        if self.bot:
+            self.bot_next = 0.0
         if self.overlay:
-            self.overlay.destroy()
-            self.overlay = None
+            self.overlay.place_forget()
         self.tick()
 
-    def drag_move(self, event):
-        if self.game_over:
-            return
-        if event.x < self.board_x or event.x > self.board_x + BOARD_W:
-            return
-        piece = self.current
-        piece_w = len(piece["shape"][0])
-        target_col = (event.x - self.board_x) // CELL
-        new_x = int(target_col - piece_w // 2)
-        new_x = max(0, min(COLS - piece_w, new_x))
-        if not self.collides(piece["shape"], new_x, piece["y"]):
-            piece["x"] = new_x
-            self.draw()
+    def next_deadline(self):
+        deadline = self.state.next_event_at()
+        if self.bot_next is not None:
+            deadline = min(deadline, self.bot_next)
+        if self.player:
+            upcoming = self.player.next_time()
+            deadline = min(deadline, self.player.replay.end_ms / 1000 if upcoming is None else upcoming)
+        return deadline
 
     def tick(self):
-        if not self.running:
+        self.tick_id = None
+        if not self.running or self.paused:
             return
-        now = time.monotonic()
-        interval = self.soft_drop_interval if self.soft_drop_active else self.drop_interval
-        if now - self.last_drop >= interval:
-            if not self.move(0, 1):
-                self.lock_piece()
-            self.last_drop = now
-
-        if self.flash_ticks > 0:
-            self.flash_ticks -= 1
-
+        now = self.clock()
+        if self.metrics and self.tick_deadline is not None:
+            self.metrics.record("tick_jitter", max(0.0, now - self.tick_deadline))
+        self.tick_deadline = None
+        if self.player:
+            self.player.apply_due(self.state, now)
+            end = self.player.replay.end_ms / 1000
+            if self.player.done and now >= end:
+                self.state.advance(end)
+                self.end_game()
+                return
+        self.state.advance(now)
+
+        if self.bot:
+            self.bot_step(now)
+            if not self.running:
+                return
+
+        self.sync()
+
+    def request_draw(self, full=True):
+        if full:
+            self.full_frame = True
+        super().request_draw()
+
+    def flush_draw(self):
+        self.draw_id = None
+        if self.state.inputs and self.running and not self.paused:
+            self.state.advance(self.clock())
+            if self.process_events():
+                self.schedule()
+        self.last_draw = time.monotonic()
         self.draw()
-        self.root.after(16, self.tick)
-
-    def get_ghost_y(self):
-        piece = self.current
-        ghost_y = piece["y"]
-        while not self.collides(piece["shape"], piece["x"], ghost_y + 1):
-            ghost_y += 1
-        return ghost_y
-
-    def draw_block(self, grid_x, grid_y, color, size=CELL):
-        x0 = self.board_x + grid_x * size
-        y0 = self.board_y + grid_y * size
-        x1 = x0 + size
-        y1 = y0 + size
-        dark = shade_color(color, 0.7)
-        light = shade_color(color, 1.25)
-
-        self.canvas.create_rectangle(x0, y0, x1, y1, fill=color, outline=dark)
-        self.canvas.create_line(x0 + 2, y0 + 2, x1 - 2, y0 + 2, fill=light)
-        self.canvas.create_line(x0 + 2, y0 + 2, x0 + 2, y1 - 2, fill=light)
-        self.canvas.create_line(x0 + 2, y1 - 2, x1 - 2, y1 - 2, fill=dark)
-        self.canvas.create_line(x1 - 2, y0 + 2, x1 - 2, y1 - 2, fill=dark)
-
-    def draw_piece(self, shape, x, y, color):
-        for r, row in enumerate(shape):
-            for c, val in enumerate(row):
-                if val:
-                    ny = y + r
-                    if ny >= 0:
-                        self.draw_block(x + c, ny, color)
-
-    def draw_preview(self, shape, color, x, y):
-        cell = 16
-        box = 4
-        width = box * cell
-        height = box * cell
-
-        self.canvas.create_rectangle(x, y, x + width, y + height, fill=BOARD_COLOR, outline=GRID_COLOR)
-        shape_h = len(shape)
-        shape_w = len(shape[0])
-        start_x = x + (box - shape_w) * cell // 2
-        start_y = y + (box - shape_h) * cell // 2
-        for r, row in enumerate(shape):
-            for c, val in enumerate(row):
-                if val:
-                    px = start_x + c * cell
-                    py = start_y + r * cell
-                    self.canvas.create_rectangle(
-                        px,
-                        py,
-                        px + cell,
-                        py + cell,
-                        fill=color,
-                        outline=shade_color(color, 0.7),
-                    )
+        if self.publisher:
+            self.publisher.publish(self.state)
+        if self.animator.active and not self.paused:
+            self.request_draw(full=False)
 
-    def draw_board(self):
-        self.canvas.create_rectangle(
-            self.board_x,
-            self.board_y,
-            self.board_x + BOARD_W,
-            self.board_y + BOARD_H,
-            fill=BOARD_COLOR,
-            outline="#2a3649",
-            width=2,
-        )
-
-        for r in range(ROWS):
-            for c in range(COLS):
-                x0 = self.board_x + c * CELL
-                y0 = self.board_y + r * CELL
-                x1 = x0 + CELL
-                y1 = y0 + CELL
-                self.canvas.create_rectangle(x0, y0, x1, y1, outline=GRID_COLOR)
-
-        for r in range(ROWS):
-            for c in range(COLS):
-                color = self.grid[r][c]
-                if color:
-                    self.draw_block(c, r, color)
-
-    def draw_hud(self):
-        panel_x = self.panel_x
-        self.canvas.create_text(
-            panel_x,
-            self.offset_y + 10,
-            anchor="nw",
-            fill=ACCENT,
-            text="NEON TETRIS",
-            font=("Segoe UI", 16, "bold"),
-        )
-        self.canvas.create_text(
-            panel_x,
-            self.offset_y + 45,
-            anchor="nw",
-            fill=TEXT_COLOR,
-            text=f"Score  {self.score}",
-            font=("Segoe UI", 12, "bold"),
-        )
-        self.canvas.create_text(
-            panel_x,
-            self.offset_y + 68,
-            anchor="nw",
-            fill=MUTED_TEXT,
-            text=f"Lines   {self.lines}",
-        )
-        self.canvas.create_text(
-            panel_x,
-            self.offset_y + 90,
-            anchor="nw",
-            fill=MUTED_TEXT,
-            text=f"Level   {self.level}",
-        )
-
-        self.canvas.create_text(
-            panel_x,
-            self.offset_y + 130,
-            anchor="nw",
-            fill=TEXT_COLOR,
-            text="Next",
-            font=("Segoe UI", 11, "bold"),
-        )
-        self.draw_preview(self.next_piece["shape"], self.next_piece["color"], panel_x, self.offset_y + 150)
-
-        self.canvas.create_text(
-            panel_x,
-            self.offset_y + 240,
-            anchor="nw",
-            fill=TEXT_COLOR,
-            text="Controls",
-            font=("Segoe UI", 11, "bold"),
-        )
-        self.canvas.create_text(
-            panel_x,
-            self.offset_y + 265,
-            anchor="nw",
-            fill=MUTED_TEXT,
-            text="Arrows: move + rotate",
-        )
-        self.canvas.create_text(
-            panel_x,
-            self.offset_y + 285,
-            anchor="nw",
-            fill=MUTED_TEXT,
-            text="Down: soft drop",
-        )
-        self.canvas.create_text(
-            panel_x,
-            self.offset_y + 305,
-            anchor="nw",
-            fill=MUTED_TEXT,
-            text="Mouse: L rotate, R drop",
-        )
-        self.canvas.create_text(
-            panel_x,
-            self.offset_y + 325,
-            anchor="nw",
-            fill=MUTED_TEXT,
-            text="Drag: slide piece",
-        )
-        self.canvas.create_text(
-            panel_x,
-            self.offset_y + 355,
-            anchor="nw",
-            fill=MUTED_TEXT,
-            text="Esc: back to menu",
-        )
-
-    def draw_line_flash(self):
-        if self.flash_ticks <= 0 or not self.flash_rows:
+    def scroll_viewport(self):
+        if self.view_rows >= self.board_rows:
             return
-        glow = shade_color(ACCENT, 1.4)
-        hot = shade_color(ACCENT, 1.8)
-
-        for row in self.flash_rows:
-            y0 = self.board_y + row * CELL
-            y1 = y0 + CELL
-            x0 = self.board_x + 2
-            x1 = self.board_x + BOARD_W - 2
-            self.canvas.create_rectangle(x0, y0 + 2, x1, y1 - 2, outline=glow, width=2)
-            self.canvas.create_line(x0, (y0 + y1) // 2, x1, (y0 + y1) // 2, fill=hot, width=2)
+        state = self.state
+        piece = state.current
+        shape = piece.state
+        first = piece.y + shape.top
+        last = state.ghost_y() + shape.bottom
+        if last - first < self.view_rows - 2:
+            top = last + 2 - self.view_rows
+        else:
+            top = first - 2
+        self.top_row = max(0, min(self.board_rows - self.view_rows, top))
 
     def draw(self):
-        self.canvas.delete("all")
-        if self.bg_photo:
-            self.canvas.create_image(0, 0, image=self.bg_photo, anchor="nw")
+        self.frame_time = self.clock()
+        finished = self.animator.update(self.frame_time)
+        for tween in finished:
+            if tween.name == "game_over" and not self.running:
+                self.show_game_over()
+        if self.full_frame:
+            self.full_frame = False
+            self.scroll_viewport()
+            self.renderer.render()
         else:
-            self.canvas.create_rectangle(0, 0, CANVAS_W, CANVAS_H, fill=BG_COLOR, outline="")
-
-        self.draw_board()
-
-        if not self.game_over:
-            ghost_y = self.get_ghost_y()
-            ghost_color = shade_color(self.current["color"], 0.35)
-            for r, row in enumerate(self.current["shape"]):
-                for c, val in enumerate(row):
-                    if val:
-                        ny = ghost_y + r
-                        if ny >= 0:
-                            x0 = self.board_x + (self.current["x"] + c) * CELL
-                            y0 = self.board_y + ny * CELL
-                            x1 = x0 + CELL
-                            y1 = y0 + CELL
-                            self.canvas.create_rectangle(x0, y0, x1, y1, outline=ghost_color)
-
-            self.draw_piece(
-                self.current["shape"],
-                self.current["x"],
-                self.current["y"],
-                self.current["color"],
-            )
-
-        self.draw_line_flash()
-        self.draw_hud()
+            self.renderer.render_tweens(finished + list(self.animator.tweens.values()))
 
     def show_game_over(self):
-        self.overlay = tk.Frame(self.root, bg="#0f1520", bd=2, relief="ridge")
+        if self.overlay is None:
+            self.build_game_over()
+        self.overlay_stats.configure(text=f"Score {self.state.score}   Lines {self.state.lines}")
         self.overlay.place(relx=0.5, rely=0.5, anchor="center")
 
+    def build_game_over(self):
+        self.overlay = tk.Frame(self.root, bg="#0f1520", bd=2, relief="ridge")
+
         title = tk.Label(
             self.overlay,
             text="GAME OVER",
@@ -577,14 +1667,13 @@ class Tetris:
         )
         title.pack(padx=20, pady=(18, 6))
 
-        stats = tk.Label(
+        self.overlay_stats = tk.Label(
             self.overlay,
-            text=f"Score {self.score}   Lines {self.lines}",
             font=("Segoe UI", 11),
             fg=TEXT_COLOR,
             bg="#0f1520",
         )
-        stats.pack(pady=(0, 12))
+        self.overlay_stats.pack(pady=(0, 12))
 
         btn_frame = tk.Frame(self.overlay, bg="#0f1520")
         btn_frame.pack(pady=(0, 16))
@@ -596,7 +1685,7 @@ class Tetris:
         menu_btn.pack(side="left", padx=6)
 
 
-def main(parent=None, on_close=None):
+def main(parent=None, on_close=None, replay=None, assets=None, reusable=False, stats=None):
     if parent is None:
         root = tk.Tk()
         owns_root = True
@@ -604,10 +1693,19 @@ def main(parent=None, on_close=None):
         root = tk.Toplevel(parent)
         owns_root = False
 
-    Tetris(root, on_close=on_close, owns_root=owns_root)
+    game = Tetris(
+        root,
+        on_close=on_close,
+        owns_root=owns_root,
+        replay=replay,
+        assets=assets,
+        reusable=reusable,
+        stats=stats,
+    )
 
     if owns_root:
         root.mainloop()
+    return game
 
 
 if __name__ == "__main__":